@@ -1,14 +1,20 @@
 # Orphadata_tool.py
 
+import asyncio
 from pydantic import BaseModel, Field, PrivateAttr
-from typing import Type, List, Dict, Any
+from typing import Type, List, Dict, Any, Optional
 from langchain.tools import BaseTool
-import requests
-import urllib.parse
-import streamlit as st  # Um auf st.session_state.lang zuzugreifen
+import streamlit as st  # Fallback auf st.session_state.lang
+from response_cache import ResponseCache
+from http_client import HttpClient
+from orphadata_backend import OrphadataUnavailable, get_orphadata_backend
 
 class RareDiseaseInput(BaseModel):
-    name: str = Field(..., description="Der (Teil-)Name einer seltenen Erkrankung")
+    name: Optional[str] = Field(None, description="Der (Teil-)Name einer seltenen Erkrankung")
+    orpha_code: Optional[str] = Field(None, description="ORPHAcode, falls bereits bekannt (überspringt die Namenssuche)")
+    # Ohne Angabe gilt die Session-Sprache; Aufrufer außerhalb des Streamlit-Threads
+    # (z. B. parallele Graph-Zweige) müssen sie mitgeben
+    language: Optional[str] = Field(None, description="Sprachcode (de, en, pl, es, pt)")
 
 class RareDiseaseTool(BaseTool):
     name: str = "rare_disease_tool"
@@ -20,48 +26,60 @@ class RareDiseaseTool(BaseTool):
     args_schema: Type[RareDiseaseInput] = RareDiseaseInput
 
     _base_url: str = PrivateAttr()
-
-    def __init__(self, base_url: str = "https://api.orphadata.com"):
+    _backend: Any = PrivateAttr()
+    _timeout: float = PrivateAttr()
+
+    def __init__(
+        self,
+        base_url: str = "https://api.orphadata.com",
+        cache: ResponseCache = None,
+        http_client: HttpClient = None,
+        backend: Any = None,
+        timeout: float = 15.0
+    ):
         super().__init__()
         # Entferne abschließenden Slash, falls vorhanden
         self._base_url = base_url.rstrip("/")
+        # Live-API (Standard) oder lokaler Spiegel, siehe orphadata_backend.py
+        self._backend = backend or get_orphadata_backend(self._base_url, http_client=http_client, cache=cache)
+        # Gesamt-Timeout für _arun (inkl. Retries)
+        self._timeout = timeout
 
-    def _run(self, name: str) -> str:
-        # Name URL-kodieren und Sprache aus Session-State
-        encoded_name = urllib.parse.quote(name)
-        lang_code = st.session_state.lang.upper()
-
-        # Endpoint zusammenbauen
-        endpoint = f"{self._base_url}/rd-cross-referencing/orphacodes/names/{encoded_name}"
+    def _run(self, name: Optional[str] = None, orpha_code: Optional[str] = None, language: Optional[str] = None) -> str:
+        # Sprache aus dem Aufruf, sonst aus dem Session-State
+        lang_code = (language or st.session_state.lang).upper()
 
-        # HTTP-Request mit Timeout- und Connection-Error-Behandlung
         try:
-            resp = requests.get(
-                endpoint,
-                params={"language": lang_code},
-                headers={"Accept": "application/json"},
-                timeout=5
-            )
-        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            if orpha_code:
+                raw_results = self._backend.cross_reference(orpha_code, lang_code)
+            elif name:
+                raw_results = self._backend.cross_reference_by_name(name, lang_code)
+            else:
+                raw_results = None
+        except OrphadataUnavailable:
             return self._service_unavailable_message()
+        return self._build_response(raw_results)
 
-        # HTTP-Fehler behandeln
-        status = resp.status_code
-        if status == 404:
-            return self._no_info_message()
-        if 400 <= status < 500:
-            return self._no_info_message()
-        if 500 <= status < 600:
-            return self._service_unavailable_message()
+    async def _arun(
+        self, name: Optional[str] = None, orpha_code: Optional[str] = None, language: Optional[str] = None
+    ) -> str:
+        lang_code = (language or st.session_state.lang).upper()
 
-        # JSON parsen
+        # Abbruch (CancelledError) wird bewusst nicht abgefangen, sondern weitergereicht
         try:
-            json_data = resp.json()
-        except ValueError:
+            if orpha_code:
+                lookup = self._backend.across_reference(orpha_code, lang_code)
+            elif name:
+                lookup = self._backend.across_reference_by_name(name, lang_code)
+            else:
+                return self._no_info_message()
+            raw_results = await asyncio.wait_for(lookup, timeout=self._timeout)
+        except (OrphadataUnavailable, asyncio.TimeoutError):
             return self._service_unavailable_message()
+        return self._build_response(raw_results)
 
+    def _build_response(self, raw_results: Any) -> str:
         # Ergebnisse extrahieren
-        raw_results = json_data.get("data", {}).get("results")
         if raw_results is None:
             return self._no_info_message()
 
@@ -86,9 +104,6 @@ class RareDiseaseTool(BaseTool):
         # Bei Erfolg nur das formatierte Ergebnis zurückgeben
         return result_str
 
-    async def _arun(self, name: str) -> str:
-        return self._run(name)
-
     def _format_result(self, record: Dict[str, Any]) -> str:
         """
         Antwort immer mit englischen Labels – Übersetzung im Agent!
@@ -1,16 +1,16 @@
 import streamlit as st
 import re
 import os
+import time
+import uuid
 import openai
 from dotenv import load_dotenv
-from typing import Annotated, TypedDict
-from langchain_core.messages import AIMessage
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Annotated, Any, Callable, Dict, List, Optional, Tuple, TypedDict
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph.message import add_messages
-import requests
-import xml.etree.ElementTree as ET
-import urllib.parse
 
 I18N = {
     "de": {
@@ -49,6 +49,7 @@ Wenn keine Antwort gefunden wird, antworte: „Dazu habe ich leider keine Inform
 
 **Antwort (in Du-Form):**""",
         "no_info_response": "Dazu habe ich leider keine Informationen.",
+        "partial_results":   "Hinweis: Einige Angaben konnten nicht rechtzeitig geladen werden.",
         "cta_text": "Möchtest du noch mehr über diese Erkrankung erfahren? Klicke auf den Button, um weitere Infos zu den Symptomen zu bekommen.",
         "button_text": "Mehr erfahren 😺",
         "more_info_btn": "Symptome anzeigen 😺",
@@ -100,6 +101,7 @@ If you find no answer, reply: “I’m sorry, I have no information on that.”
 
 **Answer (in friendly tone):**""",
         "no_info_response": "I’m sorry, I have no information on that.",
+        "partial_results":   "Note: some details could not be loaded in time.",
         "cta_text": "Would you like to learn more about the symptoms of this disease? Click the button to get additional info.",
         "button_text": "Learn more 😺",
         "more_info_btn": "Show me the symptoms 😺",
@@ -151,6 +153,7 @@ Jeśli nie znajdziesz odpowiedzi, odpowiedz: „Niestety nie mam na ten temat in
 
 **Odpowiedź (w formie nieformalnej):**""",
         "no_info_response": "Niestety nie mam na ten temat informacji.",
+        "partial_results":   "Uwaga: niektórych informacji nie udało się pobrać na czas.",
         "cta_text": "Chcesz dowiedzieć się jeszcze więcej o tej chorobie? Kliknij poniżej, aby zobaczyć dodatkowe informacje o symptomach.",
         "button_text": "Więcej informacji 😺",
         "more_info_btn": "Pokaż mi objawy 😺",
@@ -203,6 +206,7 @@ Si no encuentras respuesta, responde: “Lo siento, no tengo información al res
 
 **Respuesta (tono amigable):**""",
         "no_info_response": "Lo siento, no tengo información al respecto.",
+        "partial_results":   "Nota: algunos datos no se pudieron cargar a tiempo.",
         "cta_text": "¿Quieres saber más sobre los síntomas de esta enfermedad? Haz clic en el botón para obtener información adicional.",
         "button_text": "Saber más 😺",
         "more_info_btn": "Muéstrame los síntomas 😺",
@@ -255,6 +259,7 @@ Se não encontrar resposta, responda: “Desculpe, não tenho informações sobr
 
 **Resposta (tom amigável):**""",
         "no_info_response": "Desculpe, não tenho informações sobre isso.",
+        "partial_results":   "Nota: alguns dados não puderam ser carregados a tempo.",
         "cta_text": "Quer saber mais sobre os sintomas desta doença? Clique no botão para obter informações adicionais.",
         "button_text": "Saiba mais 😺",
         "more_info_btn": "Mostre-me os sintomas 😺",
@@ -276,6 +281,16 @@ Se não encontrar resposta, responda: “Desculpe, não tenho informações sobr
 from faq import FaqTool
 from Orphadata_tool import RareDiseaseTool
 from orphadata_phenotype_tool import OrphadataPhenotypeTool
+from http_client import get_http_client
+from orphadata_backend import get_orphadata_backend
+from disease_resolver import get_disease_resolver
+from subtype_resolver import SubtypeResolver
+from translation import translate_with_openai, translate_streaming, get_translation_cache
+from phenotype_prefetch import PhenotypePrefetcher
+from hpo_labels import get_hpo_labels
+from resources import get_registry
+from conversation_store import get_conversation_store, trim_history
+from wikidata_tool import WikidataTool
 
 import html
 
@@ -353,8 +368,42 @@ FORM_URL     = "https://tst.saventiccare.de/patientendaten-formular/"
 SUPPORT_MAIL = "info@saventiccare.de"
 
 # --- State-Schema für den Workflow-Graphen ---
-class State(TypedDict):
+def reset_or_extend(current: Optional[list], update: Optional[list]) -> list:
+    # Parallele Zweige hängen an; None (Eingabe eines neuen Turns) setzt zurück
+    return [] if update is None else (current or []) + update
+
+
+class State(TypedDict, total=False):
     messages: Annotated[list, add_messages]
+    # Sprache und Modus kommen mit jedem Turn in den Graph: die Nodes laufen in
+    # Worker-Threads von LangGraph und dürfen st.session_state nicht lesen
+    lang: str
+    mode: Optional[str]
+    # Rare-Disease-Turn (pro Turn zurückgesetzt, siehe RARE_TURN_RESET)
+    disease_term: Optional[str]
+    orpha_code: Optional[str]
+    definition_en: Optional[str]      # schon bei der Namenssuche geladen
+    definition: Optional[str]         # in Nutzersprache
+    phenotypes: Optional[Dict[str, Any]]  # {"phenotypes": [...], "names": {HPOId: Name}}
+    subtypes: Optional[Dict[str, str]]    # Klassifikations-Kinder: Name → ORPHAcode
+    wikidata: Optional[str]
+    partial: Annotated[list, reset_or_extend]  # Zweige ohne Ergebnis (Zeitlimit/Fehler)
+
+
+RARE_TURN_RESET = {
+    "disease_term": None, "orpha_code": None, "definition_en": None, "definition": None,
+    "phenotypes": None, "subtypes": None, "wikidata": None, "partial": None,
+}
+
+# Nachrichten, die pro Gespräch im Checkpoint bleiben (0 = unbegrenzt)
+HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "20"))
+
+# Zeitlimit pro Rare-Disease-Zweig in Sekunden; RARE_TIMEOUT_<ZWEIG> überschreibt es einzeln
+RARE_BRANCH_TIMEOUT = float(os.getenv("RARE_BRANCH_TIMEOUT", "8"))
+# Wikidata-Zweig (ICD-10-Code) nur auf Wunsch – zusätzlicher externer Dienst
+RARE_WIKIDATA = os.getenv("RARE_WIKIDATA", "0") == "1"
+# Nodes, deren LLM-Tokens in die Antwortblase gestreamt werden
+ANSWER_NODES = ("chatbot", "rare_definition")
 
 #Extrahieren
 def extract_disease_term(query: str, lang: str) -> str:
@@ -374,71 +423,38 @@ def extract_disease_term(query: str, lang: str) -> str:
     return m.group(0) if m else query
 
 
-# --- OpenAI 1.x-kompatible Übersetzungsfunktion ---
-def translate_with_openai(text: str, target_lang: str) -> str:
-    name_map = {
-        "DE": "Deutsch",
-        "PL": "Polnisch",
-        "ES": "Spanisch",
-        "PT": "Portugiesisch",
-        "EN": "Englisch"
-    }
-    language_name = name_map.get(target_lang, "Englisch")
-    prompt = f"Übersetze den folgenden Text ins {language_name}:\n\n{text}"
-    try:
-        client = openai.OpenAI(api_key=openai.api_key)
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        print("OpenAI-Übersetzungsfehler:", e)
-        return text
-def translate_term(term: str, target_lang: str) -> str:
-    """
-    Übersetze nur das einzelne Wort oder den kurzen Ausdruck,
-    ohne zusätzliche Erklärungen.
-    """
-    language_map = {
-        "DE": "Deutsch",
-        "EN": "Englisch",
-        "ES": "Spanisch",
-        "PL": "Polnisch",
-        "PT": "Portugiesisch"
-    }
-    lang_name = language_map.get(target_lang, "Deutsch")
-    prompt = (
-        f"Übersetze nur das folgende einzelne Wort oder den kurzen Ausdruck ins {lang_name}, "
-        f"ohne sonstige Erklärungen oder Beispiele:\n\n"
-        f"{term}"
-    )
-    try:
-        client = openai.OpenAI(api_key=openai.api_key)
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
-        )
-        # Gib nur die rohe Antwort zurück
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        print("Übersetzungsfehler:", e)
-        return term
+def last_query(state: State) -> str:
+    last = state["messages"][-1]
+    return last.content.strip() if hasattr(last, "content") else str(last).strip()
+
+
+def is_special_request(query: str, lang: str) -> bool:
+    # Ausgefülltes Formular oder persönliche Diagnose-Anfrage – beantwortet chatbot()
+    exc_pattern = EXCEPTION_PATTERNS.get(lang)
+    personal_pattern = PERSONAL_MEDICAL_PATTERNS.get(lang, PERSONAL_MEDICAL_PATTERNS["de"])
+    return bool(exc_pattern and exc_pattern.search(query)) or bool(personal_pattern.search(query))
+
+
+def route(state: State) -> str:
+    # Rare-Disease-Anfragen laufen über resolve → parallele Zweige → compose
+    if state.get("mode") == "rare" and not is_special_request(last_query(state), state["lang"]):
+        return "resolve"
+    return "chatbot"
 
 
 # --- Chatbot-Node ---
-def chatbot(state: State):
-    last = state["messages"][-1]
-    query = last.content.strip() if hasattr(last, "content") else str(last).strip()
-    lang = st.session_state.lang
+# `config` enthält die Callbacks des Graph-Laufs; wer es an LLM-Aufrufe weiterreicht,
+# liefert deren Tokens an stream_mode "messages" (Antwortblase in main())
+def chatbot(state: State, config: RunnableConfig):
+    query = last_query(state)
+    lang = state["lang"]
     texts = I18N[lang]
 
     # Ausnahme-Pattern für ausgefülltes Formular
     exc_pattern = EXCEPTION_PATTERNS.get(lang)
     if exc_pattern and exc_pattern.search(query):
-        result = st.session_state.faq_tool.run(query)
+        # Sprache mitgeben: die geteilte FaqTool wählt danach den Prompt
+        result = shared_faq_tool().invoke({"query": query, "language": lang}, config)
         return {"messages": [AIMessage(content=result["answer"].strip())]}
 
     # Persönliche Diagnose-Anfrage
@@ -468,67 +484,133 @@ def chatbot(state: State):
             ]
         }
 
-    # Rare Disease vs. Service Mode in chatbot()
-    # 1) Rare Disease Mode: **immer** Orphadata, nie FAQ
-    if st.session_state.mode == "rare":
-        # --- 1a) Extrahiere den Kerndisease-Term aus der Nutzereingabe ---
-        def extract_disease_term(query: str, lang_code: str) -> str:
-            patterns = {
-                "de": re.compile(
-                    r"(?i:\b[A-ZÄÖÜ][\wäöüß-]+"
-                    r"(?:(?:-(?:Krankheit|Erkrankung))|\s+(?:Krankheit|Erkrankung|Angioödem))\b)"
-                ),
-                "en": re.compile(r"(?i:\b[A-Z][\w-]+(?:\s+Disease)\b)|(?i:\b[A-Z][\w-]*angioedema\b)"),
-                "pl": re.compile(r"(?i:\b[A-ZŁŻŹÓĄĘĆŃ][\wąćęłńóśźż-]+(?:\s+Choroba)\b)"),
-                "es": re.compile(r"(?i:\b[A-ZÁÉÍÓÚÜÑ][\wáéíóúñü-]+(?:\s+Enfermedad)\b)"),
-                "pt": re.compile(r"(?i:\b[A-ZÁÉÍÓÚÃÕÇ][\wáéíóúãõç-]+(?:\s+Doença)\b)"),
-            }
-            pat = patterns.get(lang_code, patterns["en"])
-            m = pat.search(query)
-            return m.group(0) if m else query  # Fallback: ganzer Query
-
-        # Roh-Query
-        query = st.session_state.messages[-1]["content"] if st.session_state.messages else ""
-
-        # Extrahiere Term
-        disease_term = extract_disease_term(query, st.session_state.lang)
-        st.session_state._last_disease_name = disease_term
-
-        # --- 1b) Übersetze Term ins Englische ---
-        eng_term = translate_with_openai(disease_term, "EN")
-
-        # --- 1c) Orphadata-Abfrage mit englischem Term ---
-        api_response_en = st.session_state.orphadata_tool.run(eng_term)
-
-        # --- 1d) ORPHAcode extrahieren ---
-        m = re.search(r"ORPHAcode:\s*(\d+)", api_response_en)
-        st.session_state._last_orpha_number = m.group(1) if m else None
-
-        # --- 1e) Antwort zurück in die Nutzersprache übersetzen ---
-        target_lang = st.session_state.lang.upper()
-        if target_lang != "EN":
-            api_response = translate_with_openai(api_response_en, target_lang)
-        else:
-            api_response = api_response_en
-
-        return {"messages": [AIMessage(content=api_response)]}
-
-    # 2) Service Mode (FAQ/RAG)
-    elif st.session_state.mode == "service":
+    # Service Mode (FAQ/RAG) – der Rare-Disease-Modus läuft über eigene Nodes, siehe route()
+    if state.get("mode") == "service":
         tool_input = {
             "query": query,
-            "language": st.session_state.lang,  # z.B. "de"
+            "language": lang,  # z.B. "de"
             "category": None,  # wenn du später Kategorien auswählst
             "k": 2
         }
-        result = st.session_state.faq_tool.run(tool_input)
+        result = shared_faq_tool().invoke(tool_input, config)
         return {"messages": [AIMessage(content=result["answer"].strip())]}
 
-    # 3) Kein Modus gewählt
+    # Kein Modus gewählt
     else:
         return {"messages": [AIMessage(content=texts["select_mode_prompt"])]}
 
 
+# --- Rare-Disease-Nodes ---
+def run_branch(name: str, fn: Callable[..., Any], *args: Any) -> Tuple[Any, List[str]]:
+    """
+    Führt einen Abruf im geteilten Zweig-Pool aus und wartet höchstens das Zeitlimit des
+    Zweigs. Liefert (Ergebnis, []) oder bei Zeitüberschreitung/Fehler (None, [name]); ein
+    abgelaufener Abruf läuft im Hintergrund weiter und landet in Prefetcher/Caches.
+    """
+    timeout = float(os.getenv(f"RARE_TIMEOUT_{name.upper()}", RARE_BRANCH_TIMEOUT))
+    future = shared_branch_pool().submit(fn, *args)
+    try:
+        return future.result(timeout=timeout), []
+    except FutureTimeout:
+        print(f"Zweig {name}: kein Ergebnis nach {timeout:g} s – Antwort ohne diesen Teil")
+    except Exception as e:
+        print(f"Zweig {name} fehlgeschlagen:", e)
+    return None, [name]
+
+
+def resolve(state: State):
+    """Krankheitsbegriff extrahieren und auf einen ORPHAcode abbilden."""
+    lang = state["lang"]
+
+    # Kerndisease-Term aus der Nutzereingabe (Fallback: ganzer Query)
+    disease_term = extract_disease_term(last_query(state), lang)
+
+    # Lokal über Orphanet-Namen + Synonyme (nur mit importiertem Spiegel)
+    resolver = get_disease_resolver()
+    match = resolver.resolve(disease_term, lang) if resolver else None
+    if match:
+        return {"disease_term": disease_term, "orpha_code": match.orpha_code}
+
+    # Fallback: Term ins Englische übersetzen und per Name suchen – liefert die Definition gleich mit
+    eng_term = translate_with_openai(disease_term, "EN")
+    api_response_en = shared_orphadata_tool().run({"name": eng_term, "language": lang})
+    m = re.search(r"ORPHAcode:\s*(\d+)", api_response_en)
+    return {
+        "disease_term": disease_term,
+        "orpha_code": m.group(1) if m else None,
+        "definition_en": api_response_en,
+    }
+
+
+def fan_out(state: State) -> List[str]:
+    # Ohne ORPHAcode gibt es nur die (Nicht-)Treffer-Meldung der Namenssuche
+    if not state.get("orpha_code"):
+        return ["rare_definition"]
+    branches = ["rare_definition", "rare_phenotypes", "rare_classification"]
+    if RARE_WIKIDATA:
+        branches.append("rare_wikidata")
+    return branches
+
+
+def definition(state: State, config: RunnableConfig):
+    # Die Übersetzung streamt ihre Tokens in die Antwortblase (ANSWER_NODES)
+    text_en, partial = state.get("definition_en"), []
+    if text_en is None:
+        text_en, partial = run_branch("definition", shared_orphadata_tool().run, {
+            "orpha_code": state["orpha_code"], "language": state["lang"]
+        })
+    if text_en is None:
+        return {"partial": partial}
+    target_lang = state["lang"].upper()
+    text = translate_streaming(text_en, target_lang, config) if target_lang != "EN" else text_en
+    return {"definition": text, "partial": partial}
+
+
+def phenotypes(state: State):
+    # Über den Prefetcher: ein abgelaufener Abruf steht dem "Mehr Infos"-Klick später bereit
+    data, partial = run_branch("phenotypes", shared_prefetcher().get, state["orpha_code"], state["lang"].upper())
+    if data is None:
+        return {"partial": partial}
+    return {"phenotypes": {"phenotypes": data.phenotypes, "names": data.names}}
+
+
+def classification(state: State):
+    subtypes, partial = run_branch(
+        "classification", shared_subtype_resolver().resolve, state["orpha_code"], state["lang"].upper()
+    )
+    return {"subtypes": subtypes, "partial": partial}
+
+
+def wikidata(state: State):
+    result, partial = run_branch("wikidata", shared_wikidata_tool().run, {
+        "name": state["disease_term"], "info_type": "icd", "language": state["lang"]
+    })
+    # Nur echte Treffer übernehmen, keine "nicht gefunden"-Meldung
+    if result and result.startswith("ICD-10-Code"):
+        return {"wikidata": result, "partial": partial}
+    return {"partial": partial}
+
+
+def compose(state: State):
+    """Join der Zweige: Antwort aus Definition + Extras, Hinweis bei Teilergebnissen."""
+    texts = I18N[state["lang"]]
+    parts = [state.get("definition") or texts["no_info_response"]]
+    if state.get("wikidata"):
+        parts.append(state["wikidata"])
+    # Phänotypen/Subtypen lädt der "Mehr Infos"-Klick notfalls nach – Hinweis nur für fehlende Antwortteile
+    if set(state.get("partial") or ()) & {"definition", "wikidata"}:
+        parts.append(texts["partial_results"])
+    return {"messages": [AIMessage(content="\n\n".join(parts))]}
+
+
+def assistant_bubble(content: str) -> str:
+    return f'''
+            <div class="message-row assistant-row">
+              <img src="https://raw.githubusercontent.com/hannahleomerx/savie/main/SavieIcon.png" class="avatar">
+              <div class="message assistant-message">{content}</div>
+            </div>'''
+
+
 def _is_no_info(response: str, lang_code: str) -> bool:
     if lang_code == "DE":
         return response.strip() == "Keine Informationen zur angefragten Erkrankung gefunden."
@@ -542,6 +624,35 @@ def _is_no_info(response: str, lang_code: str) -> bool:
         return response.strip() == "No information found for that disease."
 
 
+def render_phenotype_tabs(phenotypes: list, names: dict, texts: dict) -> None:
+    """Phänotypen nach Häufigkeit in Tabs rendern; `names` = HPOId → Name in Nutzersprache."""
+    cats = {"Very frequent": [], "Frequent": [], "Occasional": []}
+    for p in phenotypes:
+        freq = p.get("HPOFrequency", "").lower()
+        if "very frequent" in freq:
+            cats["Very frequent"].append(p)
+        elif "occasional" in freq:
+            cats["Occasional"].append(p)
+        else:
+            cats["Frequent"].append(p)
+
+    vf, f, o = len(cats["Very frequent"]), len(cats["Frequent"]), len(cats["Occasional"])
+    st.markdown(f"**{texts['summary_symptoms'].format(vf=vf, f=f, o=o)}**")
+    tabs = st.tabs([
+        f"🟢 {texts['freq_very_frequent']} ({vf})",
+        f"🟡 {texts['freq_frequent']} ({f})",
+        f"🔵 {texts['freq_occasional']} ({o})",
+    ])
+    for i, key in enumerate(["Very frequent", "Frequent", "Occasional"]):
+        with tabs[i]:
+            items = cats[key]
+            if not items:
+                st.write(texts["no_info_response"])
+            else:
+                lines = [f"- {names.get(p['HPOId'], p['Name'])} ({p['HPOId']})" for p in items]
+                st.markdown("\n".join(lines))
+
+
 # Session-State Defaults (läuft nur einmal)
 if "initialized" not in st.session_state:
     st.session_state.initialized = True
@@ -560,7 +671,99 @@ if "ask_subtype" not in st.session_state:
     st.session_state.ask_subtype = False
 
 
-config = {"configurable": {"thread_id": "1"}}
+# --- Geteilte Ressourcen ---
+# Aus der prozessweiten Registry (resources.py), beim ersten Zugriff gebaut. Die Nodes
+# holen ihre Tools hierüber statt aus st.session_state (Worker-Threads des Graphen)
+def shared_faq_tool() -> FaqTool:
+    return get_registry().get("faq_tool", lambda: FaqTool(
+        persist_directory="./chroma_langchain_db",
+        collection_name="example_collection",
+        prompt_template={code: texts["faq_prompt"] for code, texts in I18N.items()},
+    ))
+
+
+def shared_orphadata_backend():
+    # Live-API oder lokaler Spiegel (ORPHADATA_BACKEND), gemeinsamer HTTP-Client
+    return get_registry().get("orphadata_backend", lambda: get_orphadata_backend(
+        "https://api.orphadata.com", http_client=get_http_client()
+    ))
+
+
+def shared_orphadata_tool() -> RareDiseaseTool:
+    return get_registry().get("orphadata_tool", lambda: RareDiseaseTool(backend=shared_orphadata_backend()))
+
+
+def shared_phenotype_tool() -> OrphadataPhenotypeTool:
+    return get_registry().get("phenotype_tool", lambda: OrphadataPhenotypeTool(backend=shared_orphadata_backend()))
+
+
+def shared_subtype_resolver() -> SubtypeResolver:
+    return get_registry().get("subtype_resolver", lambda: SubtypeResolver(backend=shared_orphadata_backend()))
+
+
+def shared_prefetcher() -> PhenotypePrefetcher:
+    # Übersetzte HPO-Namen aus dem lokalen Wörterbuch (falls importiert), Rest per LLM;
+    # Subtypen holt der Graph im Zweig rare_classification
+    return get_registry().get("prefetcher", lambda: PhenotypePrefetcher(
+        shared_phenotype_tool(), shared_subtype_resolver(),
+        hpo_labels=get_hpo_labels(), with_subtypes=False
+    ))
+
+
+def shared_wikidata_tool() -> WikidataTool:
+    return get_registry().get("wikidata_tool", lambda: WikidataTool(http_client=get_http_client()))
+
+
+def shared_branch_pool() -> ThreadPoolExecutor:
+    # Abrufe der Rare-Disease-Zweige (mit Zeitlimit, siehe run_branch)
+    return get_registry().get("branch_pool", lambda: ThreadPoolExecutor(
+        max_workers=int(os.getenv("RARE_BRANCH_WORKERS", "16")), thread_name_prefix="rare-branch"
+    ))
+
+
+def init_shared_resources() -> None:
+    """Die Session hält nur Referenzen auf die geteilten Ressourcen (für die UI)."""
+    st.session_state.faq_tool = shared_faq_tool()
+    st.session_state.orphadata_tool = shared_orphadata_tool()
+    st.session_state.phenotype_tool = shared_phenotype_tool()
+    st.session_state.subtype_resolver = shared_subtype_resolver()
+    st.session_state.prefetcher = shared_prefetcher()
+    st.session_state.graph = get_registry().get("graph", build_graph)
+
+
+def trim(state: State):
+    # Verlauf im Checkpoint auf die letzten HISTORY_WINDOW Nachrichten begrenzen
+    return {"messages": trim_history(state["messages"], HISTORY_WINDOW)}
+
+
+# Node-Namen mit Präfix – die kurzen Namen sind bereits Schlüssel im State
+RARE_BRANCHES = {
+    "rare_definition": definition,
+    "rare_phenotypes": phenotypes,
+    "rare_classification": classification,
+    "rare_wikidata": wikidata,
+}
+
+
+def build_graph():
+    # Ein Graph für alle Sessions; die Gespräche trennt der Checkpointer über die thread_id.
+    # Rare-Modus: resolve → Zweige parallel (ein Superstep, Dauer = langsamster Zweig) → compose
+    builder = StateGraph(State)
+    builder.add_node("chatbot", chatbot)
+    builder.add_node("resolve", resolve)
+    for name, node in RARE_BRANCHES.items():
+        builder.add_node(name, node)
+        # Einzelne Kanten: compose läuft nach allen Zweigen, die fan_out gestartet hat
+        builder.add_edge(name, "compose")
+    builder.add_node("compose", compose)
+    builder.add_node("trim", trim)
+    builder.add_conditional_edges(START, route, ["chatbot", "resolve"])
+    builder.add_conditional_edges("resolve", fan_out, list(RARE_BRANCHES))
+    builder.add_edge("chatbot", "trim")
+    builder.add_edge("compose", "trim")
+    builder.add_edge("trim", END)
+    return builder.compile(checkpointer=get_conversation_store().saver)
+
 
 def main():
     LANG_MAP = {
@@ -591,21 +794,25 @@ def main():
         load_dotenv()
         #openai.api_key = os.getenv("OPENAI_API_KEY")
         openai.api_key = st.secrets["OPENAI_API_KEY"]
-        st.session_state.faq_tool = FaqTool(
-            persist_directory="./chroma_langchain_db",
-            collection_name="example_collection",
-            prompt_template=texts["faq_prompt"],
-        )
-
-        st.session_state.orphadata_tool = RareDiseaseTool(base_url="https://api.orphadata.com")
-        st.session_state.phenotype_tool = OrphadataPhenotypeTool(base_url="https://api.orphadata.com")
-        builder = StateGraph(State)
-        builder.add_node("chatbot", chatbot)
-        builder.add_edge(START, "chatbot")
-        builder.add_edge("chatbot", END)
-        st.session_state.graph = builder.compile(checkpointer=MemorySaver())
+        init_shared_resources()
+        # Eigener Gesprächs-Thread pro Session im geteilten Checkpointer
+        st.session_state.thread_id = uuid.uuid4().hex
         st.session_state.graph_initialized = True
 
+    # Speicherbedarf: geteilte Ressourcen vs. Zustand dieser Session (RESOURCE_STATS=1)
+    if os.getenv("RESOURCE_STATS", "0") == "1":
+        registry = get_registry()
+        with st.sidebar.expander("Ressourcen"):
+            st.json(registry.stats())
+            st.json(registry.session_footprint(st.session_state.to_dict()))
+            st.json(get_conversation_store().stats())
+        # Trefferquoten der Caches (Übersetzungs-Memo, FAQ-Antworten)
+        with st.sidebar.expander("Caches"):
+            st.json({
+                "translation": get_translation_cache().stats(),
+                "faq_answers": st.session_state.faq_tool.cache_stats(),
+            })
+
     # CSS Styling
     st.markdown("""
         <style>
@@ -678,103 +885,29 @@ def main():
 
         # 1) Show more symptoms Button
         if st.button(texts["more_info_btn"], key="btn_show_phenos"):
-            # 1a) Haupt-Phänotypen abrufen
-            main_raw = st.session_state.phenotype_tool.get_phenotypes(
-                st.session_state._last_orpha_number,
-                lang_code=st.session_state.lang.upper()
-            )
-
-            if main_raw:
+            # 1a) Haupt-Phänotypen – im letzten Turn parallel zur Definition geladen
+            config = {"configurable": {"thread_id": st.session_state.thread_id}}
+            turn = st.session_state.graph.get_state(config).values
+            code, lang_code = st.session_state._last_orpha_number, st.session_state.lang.upper()
+            data = turn.get("phenotypes")
+            if data is None:
+                # Zweig war zu langsam: der Prefetcher lädt weiter bzw. hat es inzwischen
+                loaded = st.session_state.prefetcher.get(code, lang_code)
+                data = {"phenotypes": loaded.phenotypes, "names": loaded.names}
+
+            if data["phenotypes"]:
                 # 1b) Wenn Daten vorhanden: direkt rendern
-                cats = {"Very frequent": [], "Frequent": [], "Occasional": []}
-                for p in main_raw:
-                    freq = p.get("HPOFrequency", "").lower()
-                    if "very frequent" in freq:
-                        cats["Very frequent"].append(p)
-                    elif "occasional" in freq:
-                        cats["Occasional"].append(p)
-                    else:
-                        cats["Frequent"].append(p)
-
-                vf, f, o = len(cats["Very frequent"]), len(cats["Frequent"]), len(cats["Occasional"])
-                st.markdown(f"**{texts['summary_symptoms'].format(vf=vf, f=f, o=o)}**")
-                tabs = st.tabs([
-                    f"🟢 {texts['freq_very_frequent']} ({vf})",
-                    f"🟡 {texts['freq_frequent']} ({f})",
-                    f"🔵 {texts['freq_occasional']} ({o})",
-                ])
-                for i, key in enumerate(["Very frequent", "Frequent", "Occasional"]):
-                    with tabs[i]:
-                        items = cats[key]
-                        if not items:
-                            st.write(texts["no_info_response"])
-                        else:
-                            lines = []
-                            for p in items:
-                                name = p["Name"]
-                                if st.session_state.lang != "en":
-                                    name = translate_term(name, st.session_state.lang.upper())
-                                lines.append(f"- {name} ({p['HPOId']})")
-                            st.markdown("\n".join(lines))
+                render_phenotype_tabs(data["phenotypes"], data["names"], texts)
 
             else:
-                # 1c) Subtypen ermitteln über Cross-Reference
-                code = st.session_state._last_orpha_number
-                lang = st.session_state.lang.upper()
-
-                # HCH-IDs per JSON abrufen
-                resp = requests.get(
-                    f"https://api.orphadata.com/rd-classification/orphacodes/{code}/hchids",
-                    params={"language": lang},
-                    headers={"Accept": "application/json"},
-                    timeout=5
-                )
-                hch_list = resp.json().get("data", {}).get("results", [])
-
-                # Alle 'childs'-Codes sammeln
-                child_codes = {c for h in hch_list for c in h.get("childs", [])}
-
-                if not child_codes:
+                # 1c) Subtypen (Klassifikation + Cross-Reference) aus dem Zweig rare_classification
+                subtype_map = turn.get("subtypes")
+                if subtype_map is None:
+                    subtype_map = st.session_state.subtype_resolver.resolve(code, lang_code)
+
+                if not subtype_map:
                     st.error("Für diesen Code wurden keine Subtypen gefunden.")
                 else:
-                    # Alle 'childs'-Codes sammeln
-                    child_codes = set()
-                    for h in hch_list:
-                        child_codes.update(h.get("childs", []))
-
-                    if not child_codes:
-                        st.error("Für diesen Code wurden keine Subtypen gefunden.")
-                    else:
-                        # Per Cross-Reference-Endpoint die Namen holen
-                        subtype_map = {}
-                        for sub_code in child_codes:
-                            # 1) Raw-Response holen
-                            cr_resp = requests.get(
-                                f"https://api.orphadata.com/rd-cross-referencing/orphacodes/{sub_code}",
-                                params={"language": lang},  # das ist EN
-                                headers={"Accept": "application/json"},
-                                timeout=5
-                            )
-                            cr = cr_resp.json().get("data", {}).get("results", {})
-
-                            # 2) Englischen Namen extrahieren
-                            name_en = (
-                                    cr.get("Name")
-                                    or cr.get("preferredTerm")
-                                    or cr.get("Preferred term")
-                                    or str(sub_code)
-                            )
-
-                            # 3) Übersetzen in die Nutzersprache
-                            target = st.session_state.lang.upper()
-                            if target != "EN":
-                                name = translate_with_openai(name_en, target)
-                            else:
-                                name = name_en
-
-                            # 4) Eintrag in Map
-                            subtype_map[name] = str(sub_code)
-
                     # Session-State für Dropdown aktivieren
                     st.session_state.subtype_map = subtype_map
                     st.session_state.ask_subtype = True
@@ -802,41 +935,8 @@ def main():
 
             if submitted:
                 sub_code = st.session_state.subtype_map[choice]
-                sub_raw = st.session_state.phenotype_tool.get_phenotypes(
-                    sub_code,
-                    lang_code=st.session_state.lang.upper()
-                )
-
-                cats = {"Very frequent": [], "Frequent": [], "Occasional": []}
-                for p in sub_raw or []:
-                    freq = p.get("HPOFrequency", "").lower()
-                    if "very frequent" in freq:
-                        cats["Very frequent"].append(p)
-                    elif "occasional" in freq:
-                        cats["Occasional"].append(p)
-                    else:
-                        cats["Frequent"].append(p)
-
-                vf, f, o = len(cats["Very frequent"]), len(cats["Frequent"]), len(cats["Occasional"])
-                st.markdown(f"**{texts['summary_symptoms'].format(vf=vf, f=f, o=o)}**")
-                tabs = st.tabs([
-                    f"🟢 {texts['freq_very_frequent']} ({vf})",
-                    f"🟡 {texts['freq_frequent']} ({f})",
-                    f"🔵 {texts['freq_occasional']} ({o})",
-                ])
-                for i, key in enumerate(["Very frequent", "Frequent", "Occasional"]):
-                    with tabs[i]:
-                        items = cats[key]
-                        if not items:
-                            st.write(texts["no_info_response"])
-                        else:
-                            lines = []
-                            for p in items:
-                                name = p["Name"]
-                                if st.session_state.lang != "en":
-                                    name = translate_term(name, st.session_state.lang.upper())
-                                lines.append(f"- {name} ({p['HPOId']})")
-                            st.markdown("\n".join(lines))
+                sub_data = st.session_state.prefetcher.get(sub_code, st.session_state.lang.upper())
+                render_phenotype_tabs(sub_data.phenotypes, sub_data.names, texts)
 
                 # Cleanup
                 st.session_state.ask_subtype = False
@@ -865,31 +965,51 @@ def main():
                 prompt, st.session_state.lang
             )
 
-        # 3) Zeige „Savie tippt…“
+        # 3) Zeige „Savie tippt…“ – dieselbe Blase füllt sich danach Token für Token
         tp = st.empty()
-        tp.markdown(f'''
-            <div class="message-row assistant-row">
-              <img src="https://raw.githubusercontent.com/hannahleomerx/savie/main/SavieIcon.png" class="avatar">
-              <div class="message assistant-message">{texts["typing"]}</div>
-            </div>''', unsafe_allow_html=True)
+        tp.markdown(assistant_bubble(texts["typing"]), unsafe_allow_html=True)
 
-        # 4) Führe deine Chat-Logik aus (streaming)
-        user_texts = [m["content"] for m in st.session_state.messages if m["role"] == "user"]
+        # 4) Führe deine Chat-Logik aus (streaming): "messages" liefert die Tokens der
+        # LLM-Aufrufe in den Nodes, "updates" die fertigen Nachrichten. Nur die neue Nachricht
+        # schicken – der Verlauf liegt bereits im Checkpoint des Threads; Sprache und Modus
+        # gehen mit, die Felder des letzten Rare-Disease-Turns werden zurückgesetzt
         full = ""
-        for update in st.session_state.graph.stream({"messages": user_texts}, config, stream_mode="updates"):
-            msgs = update.get("chatbot", {}).get("messages", [])
-            for ai in msgs:
-                full += ai.content
+        streamed = ""
+        rendered_at = 0.0
+        config = {"configurable": {"thread_id": st.session_state.thread_id}}
+        turn_input = {
+            "messages": [prompt],
+            "lang": st.session_state.lang,
+            "mode": st.session_state.mode,
+            **RARE_TURN_RESET,
+        }
+        for mode, chunk in st.session_state.graph.stream(
+            turn_input, config, stream_mode=["messages", "updates"]
+        ):
+            if mode == "messages":
+                token, metadata = chunk
+                # Nur gestreamte Chunks; fertige Nachrichten kommen über "updates"
+                if isinstance(token, AIMessageChunk) and metadata.get("langgraph_node") in ANSWER_NODES:
+                    streamed += token.content or ""
+                    # Streamlit nicht mit jedem einzelnen Token neu rendern lassen
+                    if streamed and time.monotonic() - rendered_at > 0.05:
+                        tp.markdown(assistant_bubble(streamed + "▌"), unsafe_allow_html=True)
+                        rendered_at = time.monotonic()
+            else:
+                for node in ("chatbot", "compose"):
+                    for ai in (chunk.get(node) or {}).get("messages", []):
+                        full += ai.content
+        # Checkpoint des Threads verdichten, inaktive Threads aufräumen
+        get_conversation_store().end_turn(st.session_state.thread_id)
 
-        # 5) Entferne den „tippt“-Hinweis
+        # 5) Entferne die Streaming-Blase (die fertige Antwort rendert der Rerun)
         tp.empty()
 
         # 6) Bot-Antwort speichern
         st.session_state.messages.append({"role": "assistant", "content": full})
 
-        # ORPHAcode nach dem Streaming extrahieren
-        m = re.search(r"ORPHAcode:\s*(\d+)", full)
-        st.session_state._last_orpha_number = m.group(1) if m else None
+        # ORPHAcode des Turns aus dem Graph-State (None außerhalb des Rare-Disease-Modus)
+        st.session_state._last_orpha_number = st.session_state.graph.get_state(config).values.get("orpha_code")
 
         # 7) Zum Schluss neu rendern, damit alles zusammen angezeigt wird
         st.rerun()
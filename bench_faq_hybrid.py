@@ -0,0 +1,127 @@
+# bench_faq_hybrid.py
+#
+# Vergleicht die FAQ-Suche mit Vektoren allein (Query-Embedding + NumPy-Index) gegen die
+# hybride Suche aus faq_lexical.py: BM25 zuerst, nur unklare Anfragen werden eingebettet
+# und per RRF mit der Vektorsuche fusioniert. Gemessen werden Recall@k, Latenz und der
+# Anteil der Anfragen ohne Embedding-Aufruf.
+#
+# Maßgeblich ist der Lauf mit --queries: eine JSONL-Datei mit echten, gelabelten
+# Nutzerfragen {"query", "language", "id"} ("id" = answer_id, Fragetext oder Dateiname).
+# Ohne --queries dienen Kategorien und Tags der FAQ-Dateien als Stichwort-Anfragen
+# (relevant = jede Einheit der Datei); damit das nicht zirkulär wird, baut der Benchmark
+# den BM25-Index dann ohne das keywords-Feld – nur ein grober Smoke-Test.
+# Die Embeddings gehen bewusst am Cache vorbei (echter API-Round-Trip).
+#
+#   python bench_faq_hybrid.py --queries fragen.jsonl [--k 2]
+
+import argparse
+import json
+import time
+
+from dotenv import load_dotenv
+from langchain_chroma import Chroma
+from langchain_openai import OpenAIEmbeddings
+
+from bench_faq_retrieval import percentile
+from faq import LEXICAL_FETCH_K, SOURCE_LANGUAGE
+from faq_answers import FaqAnswerStore, collapse_hits, faq_key, fuse_rrf
+from faq_index import NumpyFaqIndex
+from faq_lexical import FaqLexicalIndex, lexical_confident
+
+PERSIST_DIR = "./chroma_langchain_db"
+COLLECTION = "example_collection"
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+def keyword_queries(collection):
+    """Kategorie und Tags jeder Datei als Anfrage; relevant sind alle Einheiten der Datei(en)."""
+    raw = collection.get(include=["metadatas"])
+    queries = {}
+    for meta in raw["metadatas"]:
+        meta = meta or {}
+        if meta.get("language") != SOURCE_LANGUAGE:
+            continue
+        keywords = [meta.get("category")] + str(meta.get("tags") or "").split(",")
+        for keyword in filter(None, (k.strip() for k in keywords if k)):
+            queries.setdefault(keyword, set()).add(meta.get("source_file"))
+    return [(keyword, SOURCE_LANGUAGE, files) for keyword, files in sorted(queries.items())]
+
+
+def file_queries(path):
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(r["query"], r.get("language"), {r["id"]}) for r in rows]
+
+
+def relevant(doc, expected) -> bool:
+    meta = doc.metadata
+    return bool({faq_key(doc), meta.get("id"), meta.get("source_file")} & expected)
+
+
+def report(name, latencies, recalls, extra=""):
+    print(
+        f"{name:<8} Recall@k {sum(recalls) / len(recalls):6.1%}   "
+        f"p50 {percentile(latencies, 0.5) * 1000:8.2f} ms   "
+        f"p95 {percentile(latencies, 0.95) * 1000:8.2f} ms   {extra}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FAQ-Retrieval: Vektorsuche vs. BM25 + Vektorsuche (RRF)")
+    parser.add_argument("--queries", help="JSONL mit gelabelten Nutzerfragen: query, language, id "
+                                          "(ohne: Kategorien/Tags als Stichwörter, nicht im Index)")
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--min-score", type=float, default=2.0, help="BM25-Mindestscore (FAQ_LEXICAL_MIN_SCORE)")
+    parser.add_argument("--ratio", type=float, default=1.5, help="Abstand zur nächsten Datei (FAQ_LEXICAL_RATIO)")
+    args = parser.parse_args()
+    load_dotenv()
+
+    if not FaqLexicalIndex.available():
+        raise SystemExit("tantivy ist nicht installiert (pip install tantivy).")
+    embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL)
+    store = Chroma(collection_name=COLLECTION, embedding_function=embeddings, persist_directory=PERSIST_DIR)
+    collection = store._client.get_collection(COLLECTION)
+    dense_index = NumpyFaqIndex(collection)
+    if not dense_index.size:
+        raise SystemExit(f"Collection '{COLLECTION}' ist leer – zuerst fill_db.py ausführen.")
+    started = time.perf_counter()
+    # Stichwort-Anfragen stammen aus Kategorie/Tags – diese dann nicht mitindizieren
+    lexical_index = FaqLexicalIndex(SOURCE_LANGUAGE, index_keywords=bool(args.queries))
+    units = lexical_index.load(collection, FaqAnswerStore(PERSIST_DIR))
+    load_time = time.perf_counter() - started
+
+    cases = file_queries(args.queries) if args.queries else keyword_queries(collection)
+    dense_latencies, dense_recalls = [], []
+    hybrid_latencies, hybrid_recalls = [], []
+    lexical_only = 0
+    for query, language, expected in cases:
+        # Nur Vektoren: Embedding-Round-Trip + Suche
+        started = time.perf_counter()
+        vector = embeddings.embed_query(query)
+        dense_hits = dense_index.search(vector, LEXICAL_FETCH_K, language)
+        top = collapse_hits(dense_hits, args.k)
+        dense_latencies.append(time.perf_counter() - started)
+        dense_recalls.append(any(relevant(doc, expected) for doc, _ in top))
+
+        # Hybrid: BM25 zuerst, Embedding nur bei unklarem Ergebnis
+        started = time.perf_counter()
+        lexical_hits = lexical_index.search(query, LEXICAL_FETCH_K, language)
+        if lexical_confident(lexical_hits, args.min_score, args.ratio):
+            lexical_only += 1
+            top = collapse_hits(lexical_hits, args.k)
+        else:
+            vector = embeddings.embed_query(query)
+            top = collapse_hits(fuse_rrf([dense_index.search(vector, LEXICAL_FETCH_K, language), lexical_hits]), args.k)
+        hybrid_latencies.append(time.perf_counter() - started)
+        hybrid_recalls.append(any(relevant(doc, expected) for doc, _ in top))
+
+    if args.queries:
+        mode = f"gelabelte Fragen aus {args.queries}"
+    else:
+        mode = "Kategorien/Tags als Stichwörter, keywords-Feld nicht indiziert – Smoke-Test, kein Recall-Maß"
+    print(f"Modus: {mode}")
+    print(f"{len(cases)} Anfragen, k={args.k}, "
+          f"{units} Einheiten im BM25-Index ({load_time * 1000:.0f} ms Aufbau)")
+    report("Vektor", dense_latencies, dense_recalls, f"{len(cases)} Embeddings")
+    report("Hybrid", hybrid_latencies, hybrid_recalls,
+           f"{len(cases) - lexical_only} Embeddings, {lexical_only / len(cases):.0%} ohne Embedding")
@@ -0,0 +1,106 @@
+# bench_faq_retrieval.py
+#
+# Vergleicht Latenz und Speicher der FAQ-Suche: Chroma (mit Metadaten-Filter) gegen den
+# In-Process-Index aus faq_index.py. Als Anfragen dienen die gespeicherten Embeddings
+# selbst – es werden keine OpenAI-Requests geschickt.
+#
+#   python bench_faq_retrieval.py [--queries 500] [--k 2] [--language de]
+
+import argparse
+import random
+import resource
+import time
+import tracemalloc
+
+from dotenv import load_dotenv
+from langchain_chroma import Chroma
+
+from embedding_cache import get_embeddings
+from faq_index import NumpyFaqIndex
+
+PERSIST_DIR = "./chroma_langchain_db"
+COLLECTION = "example_collection"
+
+
+def rss_mb() -> float:
+    # Aktueller Resident Set Size (Linux), sonst Spitzenwert aus getrusage
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def report(name, latencies, memory):
+    print(
+        f"{name:<8} p50 {percentile(latencies, 0.5) * 1000:7.3f} ms   "
+        f"p95 {percentile(latencies, 0.95) * 1000:7.3f} ms   "
+        f"max {max(latencies) * 1000:7.3f} ms   Speicher {memory}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FAQ-Retrieval: Chroma vs. NumPy-Index")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--language", default="de", help="Sprachfilter (leer = ohne Filter)")
+    args = parser.parse_args()
+    load_dotenv()
+
+    # --- Chroma ---
+    before = rss_mb()
+    store = Chroma(
+        collection_name=COLLECTION,
+        embedding_function=get_embeddings("text-embedding-3-small"),
+        persist_directory=PERSIST_DIR,
+    )
+    collection = store._client.get_collection(COLLECTION)
+    raw = collection.get(include=["embeddings", "metadatas"])
+    vectors = [list(v) for v in raw["embeddings"]]
+    if not vectors:
+        raise SystemExit(f"Collection '{COLLECTION}' ist leer – zuerst fill_db.py ausführen.")
+    random.seed(0)
+    queries = [random.choice(vectors) for _ in range(args.queries)]
+    search_filter = {"language": args.language} if args.language else None
+    # Aufwärmen (lädt den HNSW-Index)
+    store.similarity_search_by_vector(queries[0], k=args.k, filter=search_filter)
+    chroma_memory = rss_mb() - before
+
+    chroma_latencies, chroma_ids = [], []
+    for q in queries:
+        started = time.perf_counter()
+        docs = store.similarity_search_by_vector(q, k=args.k, filter=search_filter)
+        chroma_latencies.append(time.perf_counter() - started)
+        chroma_ids.append([d.metadata.get("paraphrase") for d in docs])
+
+    # --- NumPy-Index ---
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = NumpyFaqIndex(collection)
+    load_time = time.perf_counter() - started
+    _, numpy_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    numpy_latencies, numpy_ids = [], []
+    for q in queries:
+        started = time.perf_counter()
+        hits = index.search(q, k=args.k, language=args.language or None)
+        numpy_latencies.append(time.perf_counter() - started)
+        numpy_ids.append([d.metadata.get("paraphrase") for d, _ in hits])
+
+    overlap = sum(len(set(a) & set(b)) for a, b in zip(chroma_ids, numpy_ids))
+    total = sum(len(a) for a in chroma_ids) or 1
+
+    print(f"{len(vectors)} Vektoren, {args.queries} Anfragen, k={args.k}, Sprache={args.language or 'alle'}")
+    report("Chroma", chroma_latencies, f"~{chroma_memory:.1f} MB RSS")
+    report(
+        "NumPy", numpy_latencies,
+        f"{index.nbytes() / 2 ** 20:.2f} MB Matrix, {numpy_peak / 2 ** 20:.1f} MB Peak beim Laden ({load_time * 1000:.0f} ms)"
+    )
+    print(f"Übereinstimmung der Top-{args.k}: {overlap / total:.1%}")
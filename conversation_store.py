@@ -0,0 +1,162 @@
+# conversation_store.py
+#
+# Checkpointer für die Gesprächs-Threads des Graphen: MemorySaver (Standard) oder, mit
+# CHECKPOINT_DB, ein SqliteSaver. Pro Thread bleibt nach jedem Turn nur der letzte
+# Checkpoint stehen (der Verlauf darin ist per Fenster begrenzt, siehe agent.py), und
+# Threads ohne Aktivität seit CHECKPOINT_TTL Sekunden werden gelöscht – der Speicher pro
+# Gespräch bleibt damit konstant.
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import RemoveMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
+
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+except ImportError:
+    SqliteSaver = None
+
+ACTIVITY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS thread_activity (
+    thread_id TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL
+);
+"""
+
+
+def trim_history(messages: List[Any], window: int) -> List[RemoveMessage]:
+    """RemoveMessage-Updates für alles vor den letzten `window` Nachrichten (0 = unbegrenzt)."""
+    if window <= 0 or len(messages) <= window:
+        return []
+    return [RemoveMessage(id=m.id) for m in messages[:-window] if getattr(m, "id", None)]
+
+
+class ConversationStore:
+    """
+    Hält den Checkpointer und pflegt ihn: `compact` nach jedem Turn, `prune_idle`
+    höchstens alle `prune_interval` Sekunden. Die letzte Aktivität pro Thread liegt beim
+    SqliteSaver in derselben Datenbank (übersteht Neustarts), sonst im Speicher.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, ttl: float = 3600.0, prune_interval: float = 60.0):
+        self._ttl = ttl
+        self._prune_interval = prune_interval
+        self._pruned_at = 0.0
+        self._last_seen: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        if db_path and SqliteSaver is not None:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self.saver: BaseCheckpointSaver = SqliteSaver(sqlite3.connect(db_path, check_same_thread=False))
+            with self.saver.cursor() as cur:
+                cur.executescript(ACTIVITY_SCHEMA)
+        else:
+            if db_path:
+                print("langgraph-checkpoint-sqlite nicht installiert – Gespräche bleiben im Speicher")
+            self.saver = MemorySaver()
+
+    @property
+    def persistent(self) -> bool:
+        return not isinstance(self.saver, MemorySaver)
+
+    def touch(self, thread_id: str) -> None:
+        now = time.time()
+        if self.persistent:
+            with self.saver.cursor() as cur:
+                cur.execute("INSERT OR REPLACE INTO thread_activity (thread_id, last_seen) VALUES (?, ?)",
+                            (thread_id, now))
+        else:
+            with self._lock:
+                self._last_seen[thread_id] = now
+
+    def compact(self, thread_id: str) -> None:
+        """Alle Checkpoints (und deren Writes) eines Threads bis auf den jeweils letzten löschen."""
+        if self.persistent:
+            with self.saver.cursor() as cur:
+                for table in ("checkpoints", "writes"):
+                    cur.execute(
+                        f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_id < ("
+                        f"SELECT MAX(checkpoint_id) FROM checkpoints c "
+                        f"WHERE c.thread_id = {table}.thread_id AND c.checkpoint_ns = {table}.checkpoint_ns)",
+                        (thread_id,)
+                    )
+            return
+        # MemorySaver: thread → Namespace → Checkpoint-ID (zeitlich sortierbar, uuid6)
+        with self._lock:
+            for ns, checkpoints in list(self.saver.storage.get(thread_id, {}).items()):
+                if len(checkpoints) <= 1:
+                    continue
+                latest = max(checkpoints)
+                for checkpoint_id in [c for c in checkpoints if c != latest]:
+                    del checkpoints[checkpoint_id]
+                    self.saver.writes.pop((thread_id, ns, checkpoint_id), None)
+
+    def end_turn(self, thread_id: str) -> None:
+        """Nach jedem Turn: Aktivität merken, Thread verdichten, ggf. inaktive Threads löschen."""
+        self.touch(thread_id)
+        self.compact(thread_id)
+        if time.monotonic() - self._pruned_at >= self._prune_interval:
+            self._pruned_at = time.monotonic()
+            self.prune_idle()
+
+    def prune_idle(self) -> int:
+        """Löscht Threads, die seit `ttl` Sekunden inaktiv sind; liefert deren Anzahl."""
+        cutoff = time.time() - self._ttl
+        if self.persistent:
+            with self.saver.cursor() as cur:
+                idle = [row[0] for row in cur.execute(
+                    "SELECT thread_id FROM thread_activity WHERE last_seen < ?", (cutoff,)
+                ).fetchall()]
+                for thread_id in idle:
+                    for table in ("checkpoints", "writes", "thread_activity"):
+                        cur.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            return len(idle)
+        with self._lock:
+            idle = [t for t, seen in self._last_seen.items() if seen < cutoff]
+            for thread_id in idle:
+                del self._last_seen[thread_id]
+                self.saver.storage.pop(thread_id, None)
+                for key in [k for k in list(self.saver.writes) if k[0] == thread_id]:
+                    del self.saver.writes[key]
+        return len(idle)
+
+    def stats(self) -> Dict[str, Any]:
+        if self.persistent:
+            with self.saver.cursor(transaction=False) as cur:
+                threads = cur.execute("SELECT COUNT(*) FROM thread_activity").fetchone()[0]
+                checkpoints = cur.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+            return {"backend": "sqlite", "threads": threads, "checkpoints": checkpoints, "ttl": self._ttl}
+        with self._lock:
+            storage = self.saver.storage
+            size = sum(
+                len(c[0][1]) + len(c[1][1])
+                for namespaces in storage.values() for checkpoints in namespaces.values()
+                for c in checkpoints.values()
+            )
+            return {
+                "backend": "memory",
+                "threads": len(storage),
+                "checkpoints": sum(len(cps) for ns in storage.values() for cps in ns.values()),
+                "checkpoint_bytes": size,
+                "ttl": self._ttl,
+            }
+
+
+_store: Optional[ConversationStore] = None
+_store_lock = threading.Lock()
+
+
+def get_conversation_store() -> ConversationStore:
+    """Prozessweiter Store (CHECKPOINT_DB = Pfad für SQLite, CHECKPOINT_TTL in Sekunden)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ConversationStore(
+                db_path=os.getenv("CHECKPOINT_DB") or None,
+                ttl=float(os.getenv("CHECKPOINT_TTL", "3600")),
+            )
+        return _store
@@ -1,10 +1,11 @@
 # debug_retrieval.py
 from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
 
+from embedding_cache import get_embeddings
+
 load_dotenv()
-embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+embeddings = get_embeddings("text-embedding-3-small")
 vector_store = Chroma(
     collection_name="example_collection",
     embedding_function=embeddings,
@@ -19,3 +20,5 @@ print(f"🔍 Top-{k} Chunks für '{query}':")
 for i, d in enumerate(docs, 1):
     snippet = d.page_content.replace("\n", " ")[:300]
     print(f"{i}. «{snippet}…» — {d.metadata}")
+
+print("Embedding-Cache:", embeddings.stats())
@@ -0,0 +1,253 @@
+# disease_resolver.py
+#
+# Löst Krankheitsnamen (de/en/pl/es/pt, inkl. Synonyme) lokal in einen ORPHAcode auf,
+# damit im Rare-Modus keine LLM-Übersetzung für die Namenssuche nötig ist.
+# Datenquelle ist der Orphanet-Spiegel (orphadata_mirror.py); der Index wird beim
+# Import mit aufgebaut.
+
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import Dict, List, NamedTuple, Optional
+
+NAME_INDEX_SCHEMA = """
+DROP TABLE IF EXISTS name_index;
+DROP TABLE IF EXISTS name_trigrams;
+CREATE TABLE name_index (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    fold TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    orpha_code TEXT NOT NULL,
+    is_preferred INTEGER NOT NULL
+);
+CREATE INDEX idx_name_index_name ON name_index(name);
+CREATE INDEX idx_name_index_fold ON name_index(fold);
+CREATE VIRTUAL TABLE name_trigrams USING fts5(fold, tokenize = 'trigram');
+"""
+
+
+class DiseaseMatch(NamedTuple):
+    orpha_code: str
+    name: str
+    lang: str
+    score: float
+    method: str  # "exact", "normalized", "fuzzy" oder "span"
+
+
+# Wortfenster, die nur einen kleinen Teil der Anfrage ausmachen, zählen nur, wenn sie nach
+# Krankheit aussehen (auf gefalteten Namen, also ohne Diakritika):
+# krankheitstypische Wortendungen ...
+DISEASE_SUFFIX = re.compile(
+    r"(?:itis|osis|ose|iasis|pathy|pathie|patia|patie|amie|emie|emia|uria|urie|penia|penie|"
+    r"philia|philie|plasia|plasie|trophy|trophie|trofia|ataxia|ataxie|odem|edema|syndrom|syndrome|"
+    r"sindrome|krankheit|erkrankung)$"
+)
+# ... oder ein Wort, das eine Krankheit benennt ("Morbus Gaucher", "Gaucher disease")
+DISEASE_MARKERS = {
+    "morbus", "disease", "syndrome", "syndrom", "sindrome", "krankheit", "erkrankung",
+    "choroba", "enfermedad", "doenca", "deficiency",
+}
+# Alltagswörter, die allein nie genügen (teils mit passender Endung)
+GENERIC_WORDS = {
+    "diagnose", "prognose", "diagnosis", "prognosis", "dose", "narkose", "hypnose", "hypnosis",
+    "glukose", "glucose", "laktose", "lactose", "rose", "hose", "pose", "nose", "close", "lose",
+    "those", "whose", "chose", "purpose", "disease", "syndrome", "syndrom", "sindrome",
+    "krankheit", "erkrankung", "choroba", "enfermedad", "doenca", "morbus", "deficiency",
+}
+
+
+def disease_like(phrase: str) -> bool:
+    """Gefaltetes Wortfenster mit Krankheitsbezug – nicht nur aus Alltagswörtern."""
+    words = phrase.split()
+    specific = [w for w in words if w not in GENERIC_WORDS]
+    if not specific:
+        return False
+    return any(w in DISEASE_MARKERS for w in words) or any(DISEASE_SUFFIX.search(w) for w in specific)
+
+
+def fold_name(name: str) -> str:
+    """Kleinschreibung, ohne Diakritika und Satzzeichen, Whitespace zusammengefasst."""
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    stripped = stripped.replace("ß", "ss").replace("ł", "l")
+    return " ".join(re.sub(r"[^\w]+", " ", stripped).split())
+
+
+def trigrams(text: str) -> List[str]:
+    padded = f" {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def dice(a: str, b: str) -> float:
+    ta, tb = set(trigrams(a)), set(trigrams(b))
+    if not ta or not tb:
+        return 0.0
+    return 2 * len(ta & tb) / (len(ta) + len(tb))
+
+
+def build_name_index(conn: sqlite3.Connection) -> int:
+    """Baut name_index + Trigramm-Index aus Vorzugsbezeichnungen und Synonymen des Spiegels neu auf."""
+    conn.executescript(NAME_INDEX_SCHEMA)
+    rows = conn.execute(
+        "SELECT d.preferred_term, d.lang, d.orpha_code, 1 FROM disorders d "
+        "UNION ALL SELECT f.name, f.lang, f.orpha_code, 0 FROM names_fts f"
+    ).fetchall()
+    seen = set()
+    count = 0
+    for name, lang, orpha_code, is_preferred in rows:
+        key = (name, lang, orpha_code)
+        if not name or key in seen:
+            continue
+        seen.add(key)
+        fold = fold_name(name)
+        cur = conn.execute(
+            "INSERT INTO name_index (name, fold, lang, orpha_code, is_preferred) VALUES (?, ?, ?, ?, ?)",
+            (name, fold, lang, orpha_code, is_preferred)
+        )
+        conn.execute("INSERT INTO name_trigrams (rowid, fold) VALUES (?, ?)", (cur.lastrowid, fold))
+        count += 1
+    return count
+
+
+class DiseaseNameResolver:
+    """
+    Ordnet einen Krankheitsnamen einem ORPHAcode zu: exakt, normalisiert
+    (Groß-/Kleinschreibung, Diakritika) oder tippfehlertolerant über Trigramme.
+    Liefert None, wenn kein Kandidat `min_score` erreicht – dann übernimmt das LLM.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        min_score: float = 0.75,
+        candidates: int = 50,
+        max_span: int = 6,
+        min_span_coverage: float = 0.5
+    ):
+        if not os.path.exists(db_path):
+            raise ValueError(f"Orphadata-Spiegel nicht gefunden: {db_path}")
+        self._conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._min_score = min_score
+        self._candidates = candidates
+        self._max_span = max_span
+        # Anteil der Anfrage (Zeichen), ab dem ein einzelnes Wort ohne weitere Prüfung zählt
+        self._min_span_coverage = min_span_coverage
+
+    def resolve(self, term: str, lang: str = "en") -> Optional[DiseaseMatch]:
+        term = term.strip()
+        if not term:
+            return None
+        lang = lang.upper()
+
+        with self._lock:
+            # 1) Exakter Treffer
+            match = self._best(
+                self._conn.execute(
+                    "SELECT name, lang, orpha_code, is_preferred FROM name_index WHERE name = ?", (term,)
+                ).fetchall(),
+                lang, "exact"
+            )
+            if match:
+                return match
+
+            # 2) Normalisiert
+            fold = fold_name(term)
+            match = self._lookup_fold(fold, lang)
+            if match:
+                return match
+
+            # 3) Tippfehlertolerant: Kandidaten per Trigramm-Index, Bewertung per Dice-Koeffizient
+            match = self._fuzzy(fold, lang)
+            if match:
+                return match
+
+            # 4) Wortfenster (längste zuerst), damit auch "Was ist Morbus Gaucher?" trifft
+            for phrase in self._spans(fold):
+                match = self._lookup_span(phrase, lang, len(fold))
+                if match:
+                    return match
+        return None
+
+    def _lookup_fold(self, fold: str, lang: str) -> Optional[DiseaseMatch]:
+        return self._best(
+            self._conn.execute(
+                "SELECT name, lang, orpha_code, is_preferred FROM name_index WHERE fold = ?", (fold,)
+            ).fetchall(),
+            lang, "normalized"
+        )
+
+    def _lookup_span(self, phrase: str, lang: str, query_length: int) -> Optional[DiseaseMatch]:
+        rows = self._conn.execute(
+            "SELECT name, lang, orpha_code, is_preferred FROM name_index WHERE fold = ?", (phrase,)
+        ).fetchall()
+        if len(phrase) < self._min_span_coverage * query_length:
+            # Geringer Anteil an der Anfrage (Alltagswort, Abkürzung als Synonym): nur Fenster
+            # mit Krankheitsbezug, nur Vorzugsbezeichnungen oder Namen in Nutzersprache
+            if not disease_like(phrase):
+                return None
+            rows = [r for r in rows if r[1] == lang or r[3]]
+        return self._best(rows, lang, "span")
+
+    def _spans(self, fold: str) -> List[str]:
+        words = fold.split()
+        spans: Dict[str, None] = {}
+        for size in range(min(len(words) - 1, self._max_span), 0, -1):
+            for start in range(len(words) - size + 1):
+                phrase = " ".join(words[start:start + size])
+                if len(phrase) >= 4:
+                    spans[phrase] = None
+        return list(spans)
+
+    def _fuzzy(self, fold: str, lang: str) -> Optional[DiseaseMatch]:
+        grams = [g.strip() for g in trigrams(fold)]
+        grams = list(dict.fromkeys(g for g in grams if len(g) == 3))
+        if not grams:
+            return None
+        query = " OR ".join('"' + g.replace('"', '""') + '"' for g in grams)
+        rows = self._conn.execute(
+            "SELECT n.name, n.fold, n.lang, n.orpha_code, n.is_preferred "
+            "FROM name_trigrams t JOIN name_index n ON n.id = t.rowid "
+            "WHERE name_trigrams MATCH ? ORDER BY bm25(name_trigrams) LIMIT ?",
+            (query, self._candidates)
+        ).fetchall()
+
+        best: Optional[DiseaseMatch] = None
+        best_key = None
+        for name, cand_fold, cand_lang, orpha_code, is_preferred in rows:
+            score = dice(fold, cand_fold)
+            key = (score, cand_lang == lang, is_preferred)
+            if best_key is None or key > best_key:
+                best_key = key
+                best = DiseaseMatch(orpha_code, name, cand_lang, score, "fuzzy")
+        if best is None or best.score < self._min_score:
+            return None
+        return best
+
+    @staticmethod
+    def _best(rows: List[tuple], lang: str, method: str) -> Optional[DiseaseMatch]:
+        if not rows:
+            return None
+        # Sprache des Nutzers vor Vorzugsbezeichnung vor Synonym
+        name, cand_lang, orpha_code, _ = max(rows, key=lambda r: (r[1] == lang, r[3]))
+        return DiseaseMatch(orpha_code, name, cand_lang, 1.0, method)
+
+
+_resolver: Optional[DiseaseNameResolver] = None
+_resolver_lock = threading.Lock()
+
+
+def get_disease_resolver() -> Optional[DiseaseNameResolver]:
+    """Geteilter Resolver über dem Spiegel; None, wenn kein Spiegel importiert wurde."""
+    global _resolver
+    from orphadata_mirror import DEFAULT_MIRROR_PATH
+    db_path = os.getenv("ORPHADATA_MIRROR_PATH", DEFAULT_MIRROR_PATH)
+    with _resolver_lock:
+        if _resolver is None and os.path.exists(db_path):
+            _resolver = DiseaseNameResolver(
+                db_path, min_score=float(os.getenv("DISEASE_RESOLVER_MIN_SCORE", "0.75"))
+            )
+        return _resolver
@@ -0,0 +1,192 @@
+# embedding_cache.py
+#
+# Embeddings-Wrapper mit Cache: wiederholte FAQ-Fragen (und unveränderte Dokumente
+# beim Re-Ingest) werden nicht erneut bei OpenAI eingebettet.
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+DEFAULT_EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-NFC, Whitespace zusammengefasst – eingebettet wird genau dieser Text."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Zweistufiger Cache vor einem Embeddings-Modell: LRU im Speicher vor einer
+    SQLite-Datei (Vektoren als float32-Blob). Schlüssel = sha256 des normalisierten
+    Texts + Modell + Dimensionen, d. h. ein Modellwechsel nutzt keine alten Vektoren.
+    """
+
+    def __init__(
+        self,
+        embeddings: Optional[Embeddings] = None,
+        model: str = DEFAULT_EMBEDDING_MODEL,
+        dimensions: Optional[int] = None,
+        db_path: Optional[str] = "./cache/embeddings.sqlite",
+        max_entries: int = 2048,
+        max_disk_entries: int = 200000
+    ):
+        self._embeddings = embeddings or OpenAIEmbeddings(model=model, dimensions=dimensions)
+        self._namespace = f"{model}|{dimensions or 'default'}"
+        self._max_entries = max_entries
+        self._max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "disk_hits": 0, "embedded": 0}
+
+        # SQLite-Tier ist optional (db_path=None → nur Speicher)
+        self._conn: Optional[sqlite3.Connection] = None
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY,"
+                " vector BLOB NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_accessed ON embeddings(accessed_at)"
+            )
+            self._conn.commit()
+
+    # --- Embeddings-Interface ---
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        found, missing = self._lookup(texts)
+        if missing:
+            # Fehlende Texte in einem Request nachladen
+            unique = list(dict.fromkeys(missing.values()))
+            found.update(self._fill(missing, unique, self._embeddings.embed_documents(unique)))
+        return [found[i] for i in range(len(texts))]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        found, missing = self._lookup(texts)
+        if missing:
+            unique = list(dict.fromkeys(missing.values()))
+            found.update(self._fill(missing, unique, await self._embeddings.aembed_documents(unique)))
+        return [found[i] for i in range(len(texts))]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    # --- Interne Helfer ---
+    def _key(self, normalized: str) -> str:
+        return hashlib.sha256(f"{self._namespace}|{normalized}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, texts: List[str]) -> Tuple[Dict[int, List[float]], Dict[int, str]]:
+        """(gefundene Vektoren je Position, fehlende normalisierte Texte je Position)."""
+        found: Dict[int, List[float]] = {}
+        missing: Dict[int, str] = {}
+        now = time.time()
+        with self._lock:
+            for i, text in enumerate(texts):
+                normalized = normalize_text(text)
+                vector = self._get(self._key(normalized), now)
+                if vector is None:
+                    self._stats["misses"] += 1
+                    missing[i] = normalized
+                else:
+                    self._stats["hits"] += 1
+                    found[i] = vector
+            if self._conn is not None and found:
+                self._conn.commit()
+        return found, missing
+
+    def _fill(self, missing: Dict[int, str], texts: List[str], vectors: List[List[float]]) -> Dict[int, List[float]]:
+        self._store(texts, vectors)
+        by_text = dict(zip(texts, vectors))
+        return {i: by_text[text] for i, text in missing.items()}
+
+    def _get(self, key: str, now: float) -> Optional[List[float]]:
+        # Aufruf nur mit gehaltenem Lock
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            return vector
+        if self._conn is None:
+            return None
+        row = self._conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        vector = array("f", row[0]).tolist()
+        self._conn.execute("UPDATE embeddings SET accessed_at = ? WHERE key = ?", (now, key))
+        self._stats["disk_hits"] += 1
+        self._remember(key, vector)
+        return vector
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+
+    def _store(self, texts: List[str], vectors: List[List[float]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._stats["embedded"] += len(texts)
+            for text, vector in zip(texts, vectors):
+                key = self._key(text)
+                self._remember(key, vector)
+                if self._conn is not None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO embeddings (key, vector, accessed_at) VALUES (?, ?, ?)",
+                        (key, array("f", vector).tobytes(), now)
+                    )
+            if self._conn is None:
+                return
+            # Platten-Tier begrenzen: zuletzt nicht genutzte Vektoren verwerfen
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            overflow = count - self._max_disk_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    " SELECT key FROM embeddings ORDER BY accessed_at ASC LIMIT ?)",
+                    (overflow,)
+                )
+            self._conn.commit()
+
+
+_embeddings: Dict[Tuple[str, Optional[int]], CachedEmbeddings] = {}
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings(model: str = DEFAULT_EMBEDDING_MODEL, dimensions: Optional[int] = None) -> CachedEmbeddings:
+    """Geteilte, gecachte Embeddings pro (Modell, Dimensionen)."""
+    with _embeddings_lock:
+        embeddings = _embeddings.get((model, dimensions))
+        if embeddings is None:
+            embeddings = CachedEmbeddings(
+                model=model,
+                dimensions=dimensions,
+                db_path=os.getenv("EMBEDDING_CACHE_PATH", "./cache/embeddings.sqlite") or None,
+                max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "2048")),
+            )
+            _embeddings[(model, dimensions)] = embeddings
+        return embeddings
@@ -0,0 +1,99 @@
+# eval_faq_direct.py
+#
+# Offline-Auswertung des FAQ-Direkttreffers (FaqTool ohne LLM-Generierung):
+# Abdeckung (Anteil direkt beantworteter Fragen), Präzision (Anteil davon mit der
+# richtigen FAQ-id) und Latenz der Entscheidung für verschiedene Schwellwerte.
+#
+# Ohne --queries dient jede gespeicherte Paraphrase als Anfrage (Leave-one-out): eingebettet
+# wird nur ihr Fragetext – die gespeicherten Vektoren enthalten Frage + Antwort, die
+# Geschwister-Paraphrasen teilen also den Antworttext und würden sonst trivial treffen.
+# Mit --queries wird eine JSONL-Datei {"query", "language", "id"} eingebettet
+# ("id" = answer_id wie "Answertime.txt#2" oder der Fragetext der Einheit).
+#
+#   python eval_faq_direct.py [--queries fragen.jsonl] [--margins 0.0,0.02,0.05]
+
+import argparse
+import json
+import time
+
+from dotenv import load_dotenv
+from langchain_chroma import Chroma
+
+from embedding_cache import get_embeddings
+from faq import pick_direct_hit
+from faq_answers import faq_key
+from faq_index import NumpyFaqIndex
+
+PERSIST_DIR = "./chroma_langchain_db"
+COLLECTION = "example_collection"
+THRESHOLDS = [0.70, 0.75, 0.80, 0.85, 0.88, 0.90, 0.92, 0.95]
+CANDIDATES = 8
+
+
+def load_cases(args, collection, embeddings):
+    """(Vektor, Sprache, erwartete FAQ-Einheit, auszuschließende Dokument-id)."""
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        vectors = embeddings.embed_documents([r["query"] for r in rows])
+        return [(v, r.get("language"), r["id"], None) for v, r in zip(vectors, rows)]
+    raw = collection.get(include=["documents", "metadatas"])
+    metas = [m or {} for m in raw["metadatas"]]
+    questions = [m.get("paraphrase") or _question(text or "") for text, m in zip(raw["documents"], metas)]
+    vectors = embeddings.embed_documents(questions)
+    return [
+        (v, m.get("language"), m.get("answer_id") or m.get("id"), doc_id)
+        for doc_id, v, m in zip(raw["ids"], vectors, metas)
+    ]
+
+
+def _question(text: str) -> str:
+    # Dokumenttext ist "Q: <Paraphrase>" (Alt-Bestand: "Q: ...\nA: ...")
+    question, _, _ = text.partition("\nA:")
+    return question[2:].strip() if question.startswith("Q:") else question.strip()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Präzision/Latenz des FAQ-Direkttreffers je Schwellwert")
+    parser.add_argument("--queries", help="JSONL mit query, language, id (sonst Leave-one-out)")
+    parser.add_argument("--margins", default="0.0,0.02,0.05,0.08", help="kommagetrennte Abstände zur 2. FAQ")
+    args = parser.parse_args()
+    load_dotenv()
+
+    embeddings = get_embeddings("text-embedding-3-small")
+    store = Chroma(collection_name=COLLECTION, embedding_function=embeddings, persist_directory=PERSIST_DIR)
+    collection = store._client.get_collection(COLLECTION)
+    index = NumpyFaqIndex(collection)
+    cases = load_cases(args, collection, embeddings)
+    if not cases:
+        raise SystemExit(f"Collection '{COLLECTION}' ist leer – zuerst fill_db.py ausführen.")
+
+    # Kandidaten einmal pro Anfrage holen (eigene Paraphrase beim Leave-one-out entfernen)
+    candidates, search_times = [], []
+    for vector, language, _, exclude in cases:
+        started = time.perf_counter()
+        hits = index.search(vector, CANDIDATES + 1, language=language)
+        search_times.append(time.perf_counter() - started)
+        candidates.append([(doc, score) for doc, score in hits if doc.id != exclude][:CANDIDATES])
+    search_times.sort()
+
+    print(f"{len(cases)} Anfragen ({'Datei' if args.queries else 'Leave-one-out'}), "
+          f"Retrieval p50 {search_times[len(search_times) // 2] * 1e6:.0f} µs")
+    print(f"{'Schwelle':>8} {'Abstand':>8} {'Abdeckung':>10} {'Präzision':>10} {'Entscheidung p50':>17}")
+    for margin in [float(m) for m in args.margins.split(",")]:
+        for threshold in THRESHOLDS:
+            direct = correct = 0
+            decision_times = []
+            for (_, _, expected, _), hits in zip(cases, candidates):
+                started = time.perf_counter()
+                hit = pick_direct_hit(hits, threshold, margin)
+                decision_times.append(time.perf_counter() - started)
+                if hit is not None:
+                    direct += 1
+                    correct += expected in (faq_key(hit[0]), hit[0].metadata.get("id"))
+            decision_times.sort()
+            print(
+                f"{threshold:>8.2f} {margin:>8.2f} {direct / len(cases):>10.1%} "
+                f"{(correct / direct if direct else 0.0):>10.1%} "
+                f"{decision_times[len(decision_times) // 2] * 1e6:>14.1f} µs"
+            )
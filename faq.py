@@ -1,14 +1,59 @@
 __import__('pysqlite3')
 import sys
 sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
-from typing import Type, Optional, Dict, Any
-from langchain_community.chat_models import ChatOpenAI
+from typing import Type, Optional, Dict, Any, List, Tuple, Union
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
-from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableConfig
+
+from embedding_cache import get_embeddings
+from faq_answers import CollapsingFaqRetriever, FaqAnswerStore, collapse_hits, faq_key, resolve_answers
+from faq_index import NumpyFaqIndex
+from faq_lexical import FaqLexicalIndex, lexical_confident
+from llm_gateway import get_llm_gateway
+from semantic_cache import SemanticAnswerCache, get_answer_cache
+from translation import translate_streaming, atranslate_streaming
+
+# Sprache, in der die FAQ-Antworten gepflegt werden (fill_db.py übersetzt nur die Fragen)
+SOURCE_LANGUAGE = "de"
+# BM25-Kandidaten pro Anfrage (erste Stufe bzw. Eingang der RRF-Fusion)
+LEXICAL_FETCH_K = 16
+
+
+def pick_direct_hit(
+    hits: List[Tuple[Document, float]], threshold: float, margin: float
+) -> Optional[Tuple[Document, float]]:
+    """
+    Bester Treffer, wenn er eindeutig ist: Kosinus-Ähnlichkeit >= `threshold` und
+    Abstand >= `margin` zum besten Treffer einer *anderen* FAQ-Einheit (siehe `faq_key`).
+    """
+    if not hits:
+        return None
+    top_doc, top_score = hits[0]
+    if top_score < threshold:
+        return None
+    top_id = faq_key(top_doc)
+    runner_up = next((score for doc, score in hits[1:] if faq_key(doc) != top_id), None)
+    if runner_up is not None and top_score - runner_up < margin:
+        return None
+    return hits[0]
+
+
+def stored_answer(doc: Document) -> str:
+    """Antwortteil eines Paraphrase-Dokuments ("Q: ...\nA: ...")."""
+    _, sep, answer = doc.page_content.partition("\nA:")
+    return answer.strip() if sep else doc.page_content.strip()
+
 
 class FaqToolInput(BaseModel):
     query: str = Field(..., description="The user question")
@@ -23,37 +68,196 @@ class FaqTool(BaseTool):
     )
     args_schema: Type[BaseModel] = FaqToolInput
 
-    def __init__(self, persist_directory: str, collection_name: str, prompt_template: str):
+    def __init__(
+        self,
+        persist_directory: str,
+        collection_name: str,
+        prompt_template: Union[str, Dict[str, str]],
+        timeout: float = 60.0,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        ingest_check_interval: float = 30.0,
+        max_chains: int = 32,
+        retriever: Optional[str] = None,
+        direct_threshold: Optional[float] = None,
+        direct_margin: Optional[float] = None,
+        lexical: Optional[bool] = None,
+        lexical_min_score: Optional[float] = None,
+        lexical_ratio: Optional[float] = None
+    ):
         super().__init__()
-        # LLM und Embeddings
-        self._llm = ChatOpenAI(temperature=0)
-        self._embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+        # Gesamt-Timeout für _arun (Retrieval + Generierung)
+        self._timeout = timeout
+        # LLM (geteilt über das Gateway) und Embeddings (mit Cache für wiederholte Fragen)
+        self._llm = get_llm_gateway().chat_model(temperature=0)
+        self._embeddings = get_embeddings("text-embedding-3-small")
         # Chroma-Store (mit Standard-Einstellungen)
         self._store = Chroma(
             persist_directory=persist_directory,
             collection_name=collection_name,
             embedding_function=self._embeddings
         )
-        # Prompt-Template
+        # Prompt-Template, optional pro Sprache ({"de": ..., "en": ...}) – dann kann eine
+        # Instanz prozessweit von allen Sessions geteilt werden
         self._prompt_template = prompt_template
+        # Antworten liegen einmal pro FAQ neben der Chroma-DB (fill_db.py)
+        self._answers = FaqAnswerStore(persist_directory)
+        # Fertige Chains pro (Sprache, Kategorie, k); der Request-Pfad verändert sonst keinen
+        # Zustand, eine Instanz kann also gleichzeitig mehrere Sessions bedienen
+        self._chains: "OrderedDict[Tuple[Optional[str], Optional[str], int], RetrievalQA]" = OrderedDict()
+        self._max_chains = max_chains
+        self._lock = threading.Lock()
+        # Semantischer Antwort-Cache; gilt nur für den aktuellen Ingest der Collection
+        self._collection_name = collection_name
+        self._answer_cache = answer_cache or get_answer_cache()
+        self._ingest_check_interval = ingest_check_interval
+        self._ingest_checked_at = 0.0
+        self._ingest_id: Optional[str] = None
+        # Serialisiert Ingest-Prüfung und Neuaufbau der Indizes (eigener Lock, damit der
+        # Chain-Cache währenddessen nicht blockiert)
+        self._ingest_lock = threading.Lock()
+        # Retriever: "chroma" (Standard) oder "numpy" (In-Process-Index, FAQ_RETRIEVER)
+        retriever = (retriever or os.getenv("FAQ_RETRIEVER", "chroma")).lower()
+        self._index: Optional[NumpyFaqIndex] = NumpyFaqIndex() if retriever == "numpy" else None
+        # Direkttreffer ohne LLM-Generierung (Schwellwerte per eval_faq_direct.py abstimmen; > 1 = aus)
+        self._direct_threshold = (
+            direct_threshold if direct_threshold is not None else float(os.getenv("FAQ_DIRECT_THRESHOLD", "0.9"))
+        )
+        self._direct_margin = (
+            direct_margin if direct_margin is not None else float(os.getenv("FAQ_DIRECT_MARGIN", "0.05"))
+        )
+        # BM25 als erste Stufe (FAQ_LEXICAL=0 schaltet ab; ohne tantivy automatisch aus)
+        if lexical is None:
+            lexical = os.getenv("FAQ_LEXICAL", "1") != "0"
+        self._lexical: Optional[FaqLexicalIndex] = (
+            FaqLexicalIndex(SOURCE_LANGUAGE) if lexical and FaqLexicalIndex.available() else None
+        )
+        self._lexical_min_score = (
+            lexical_min_score if lexical_min_score is not None else float(os.getenv("FAQ_LEXICAL_MIN_SCORE", "2.0"))
+        )
+        self._lexical_ratio = (
+            lexical_ratio if lexical_ratio is not None else float(os.getenv("FAQ_LEXICAL_RATIO", "1.5"))
+        )
+
+    def _current_ingest_id(self) -> Optional[str]:
+        # fill_db.py schreibt bei jedem Ingest eine neue ingest_id in die Collection-Metadaten;
+        # nur alle `ingest_check_interval` Sekunden nachsehen
+        with self._lock:
+            if time.monotonic() - self._ingest_checked_at < self._ingest_check_interval:
+                return self._ingest_id
+        with self._ingest_lock:
+            # Erneut prüfen: ein anderer Request hat ggf. gerade geprüft bzw. neu geladen
+            if time.monotonic() - self._ingest_checked_at < self._ingest_check_interval:
+                return self._ingest_id
+            collection = self._store._client.get_collection(self._collection_name)
+            ingest_id = f"{(collection.metadata or {}).get('ingest_id')}|{collection.count()}"
+            # Neuer Ingest → In-Process-Indizes neu laden (nur ein Request gleichzeitig)
+            if self._index is not None and (ingest_id != self._ingest_id or not self._index.size):
+                self._index.load(collection)
+            if self._lexical is not None and (ingest_id != self._ingest_id or not self._lexical.size):
+                self._lexical.load(collection, self._answers)
+            with self._lock:
+                self._ingest_id = ingest_id
+                self._ingest_checked_at = time.monotonic()
+            return ingest_id
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self._answer_cache.stats()
 
-    def _configure_chain(self, language: Optional[str], category: Optional[str], k: int) -> None:
-        # Filter nach Sprache/Kategorie
-        filters: Dict[str, str] = {
+    def scored_hits(
+        self, vector: List[float], k: int, language: Optional[str], category: Optional[str]
+    ) -> List[Tuple[Document, float]]:
+        """Top-k mit Kosinus-Ähnlichkeit, absteigend (NumPy-Index oder Chroma)."""
+        if self._index is not None:
+            return self._index.search(vector, k, language, category)
+        filters: Dict[str, Any] = {
             **({"language": language} if language else {}),
             **({"category": category} if category else {})
         }
-        retriever = self._store.as_retriever(search_kwargs={
-            "k": k,
-            "filter": filters
-        })
+        # Chroma liefert Distanzen: "l2" ist quadriert, für normierte Embeddings gilt cos = 1 - d/2
+        space = (self._store._collection.metadata or {}).get("hnsw:space", "l2")
+        if len(filters) > 1:
+            # Chroma verlangt für mehrere Bedingungen ein explizites $and
+            filters = {"$and": [{key: value} for key, value in filters.items()]}
+        results = self._store.similarity_search_by_vector_with_relevance_scores(
+            vector, k=k, filter=filters or None
+        )
+        if space == "cosine":
+            return [(doc, 1.0 - d) for doc, d in results]
+        if space == "ip":
+            return [(doc, -d) for doc, d in results]
+        return [(doc, 1.0 - d / 2) for doc, d in results]
+
+    def lexical_hits(
+        self, query: str, k: int, language: Optional[str], category: Optional[str]
+    ) -> List[Tuple[Document, float]]:
+        """Top-k Q/A-Einheiten nach BM25 (leer, wenn die lexikalische Stufe aus ist)."""
+        if self._lexical is None:
+            return []
+        return self._lexical.search(query, k, language, category)
+
+    def _lexical_documents(
+        self, query: str, k: int, language: Optional[str], category: Optional[str]
+    ) -> Optional[List[Document]]:
+        # Eindeutiges BM25-Ergebnis → Kontext für die Chain ohne Query-Embedding; sonst None
+        hits = self.lexical_hits(query, LEXICAL_FETCH_K, language, category)
+        if not lexical_confident(hits, self._lexical_min_score, self._lexical_ratio):
+            return None
+        return [doc for doc, _ in resolve_answers(collapse_hits(hits, k), self._answers)]
+
+    @staticmethod
+    def _child_config(run_manager: Any) -> Optional[RunnableConfig]:
+        # Callbacks des Tool-Aufrufs an Chain/Übersetzung weitergeben, damit z. B. LangGraph
+        # (stream_mode "messages") die Tokens der Generierung live erhält
+        return {"callbacks": run_manager.get_child()} if run_manager is not None else None
+
+    def _direct_hit(
+        self, vector: List[float], language: Optional[str], category: Optional[str]
+    ) -> Optional[Tuple[Document, float]]:
+        if self._direct_threshold > 1:
+            return None
+        # Mehr Kandidaten als k, damit der Abstand zur nächsten *anderen* FAQ messbar ist
+        return pick_direct_hit(
+            self.scored_hits(vector, 8, language, category), self._direct_threshold, self._direct_margin
+        )
+
+    def _chain(self, language: Optional[str], category: Optional[str], k: int) -> RetrievalQA:
+        key = (language, category, k)
+        with self._lock:
+            chain = self._chains.get(key)
+            if chain is not None:
+                self._chains.move_to_end(key)
+                return chain
+        # Außerhalb des Locks bauen; bei gleichzeitigem Bau gewinnt die erste Chain
+        chain = self._build_chain(language, category, k)
+        with self._lock:
+            chain = self._chains.setdefault(key, chain)
+            self._chains.move_to_end(key)
+            while len(self._chains) > self._max_chains:
+                self._chains.popitem(last=False)
+        return chain
+
+    def _build_chain(self, language: Optional[str], category: Optional[str], k: int) -> RetrievalQA:
+        # Filter nach Sprache/Kategorie (in scored_hits); Treffer pro FAQ zusammengefasst,
+        # Antwort aus dem Antwort-Datensatz statt aus jeder Paraphrase; mit BM25 per RRF fusioniert
+        retriever = CollapsingFaqRetriever(
+            search=self.scored_hits,
+            embeddings=self._embeddings,
+            answers=self._answers,
+            k=k,
+            language=language,
+            category=category,
+            lexical=self.lexical_hits if self._lexical is not None else None
+        )
         # Prompt nur mit context & question, Sprache/Kategorie als Literal
         suffix = f"(Kategorie: {category or 'alle'}, Sprache: {language or 'alle'})"
+        template = self._prompt_template
+        if isinstance(template, dict):
+            template = template.get(language or SOURCE_LANGUAGE) or template[SOURCE_LANGUAGE]
         prompt = PromptTemplate(
             input_variables=["context", "question"],
-            template=self._prompt_template + "\n\n" + suffix
+            template=template + "\n\n" + suffix
         )
-        self._qa_chain = RetrievalQA.from_chain_type(
+        return RetrievalQA.from_chain_type(
             llm=self._llm,
             chain_type="stuff",
             retriever=retriever,
@@ -66,27 +270,85 @@ class FaqTool(BaseTool):
         query: str,
         k: int = 2,
         language: Optional[str] = None,
-        category: Optional[str] = None
+        category: Optional[str] = None,
+        run_manager: Optional[CallbackManagerForToolRun] = None
     ) -> Dict[str, Any]:
-        # Chain konfigurieren
-        self._configure_chain(language, category, k)
+        config = self._child_config(run_manager)
+        ingest_id = self._current_ingest_id()
+        # Stichwort-Anfrage mit eindeutigem BM25-Treffer → Generierung ohne Embedding-Aufruf
+        docs = self._lexical_documents(query, k, language, category)
+        if docs is not None:
+            result = self._chain(language, category, k).combine_documents_chain.invoke(
+                {"input_documents": docs, "question": query}, config
+            )
+            return {"answer": result["output_text"], "sources": [doc.metadata for doc in docs], "lexical": True}
+
+        # Paraphrase einer schon beantworteten Frage? (Query-Embedding kommt aus dem Cache
+        # und wird vom Retriever danach nicht erneut angefragt)
+        vector = self._embeddings.embed_query(query)
+        cached = self._answer_cache.lookup(vector, language, category, k, ingest_id)
+        if cached is not None:
+            return cached
+
+        # Eindeutiger Treffer → gespeicherte Antwort ohne Generierung
+        # (andere Sprachen: memoisierte Übersetzung, ab dem zweiten Mal ohne LLM-Aufruf)
+        hit = self._direct_hit(vector, language, category)
+        if hit is not None:
+            hit = resolve_answers([hit], self._answers)[0]
+            text = stored_answer(hit[0])
+            if language and language.lower() != SOURCE_LANGUAGE:
+                text = translate_streaming(text, language.upper(), config)
+            return {"answer": text, "sources": [hit[0].metadata], "direct": True}
+
         # RetrievalQA erwartet nur 'query'
-        result = self._qa_chain({"query": query})
-        return {
+        result = self._chain(language, category, k).invoke({"query": query}, config)
+        answer = {
             "answer": result["result"],
             "sources": [doc.metadata for doc in result["source_documents"]]
         }
+        self._answer_cache.store(vector, language, category, k, ingest_id, answer)
+        return answer
 
     async def _arun(
         self,
         query: str,
         k: int = 2,
         language: Optional[str] = None,
-        category: Optional[str] = None
+        category: Optional[str] = None,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> Dict[str, Any]:
-        self._configure_chain(language, category, k)
-        result = await self._qa_chain.arun({"query": query})
-        return {
+        config = self._child_config(run_manager)
+        ingest_id = self._current_ingest_id()
+        docs = self._lexical_documents(query, k, language, category)
+        if docs is not None:
+            result = await asyncio.wait_for(
+                self._chain(language, category, k).combine_documents_chain.ainvoke(
+                    {"input_documents": docs, "question": query}, config
+                ),
+                timeout=self._timeout
+            )
+            return {"answer": result["output_text"], "sources": [doc.metadata for doc in docs], "lexical": True}
+
+        vector = await self._embeddings.aembed_query(query)
+        cached = self._answer_cache.lookup(vector, language, category, k, ingest_id)
+        if cached is not None:
+            return cached
+
+        hit = self._direct_hit(vector, language, category)
+        if hit is not None:
+            hit = resolve_answers([hit], self._answers)[0]
+            text = stored_answer(hit[0])
+            if language and language.lower() != SOURCE_LANGUAGE:
+                text = await atranslate_streaming(text, language.upper(), config)
+            return {"answer": text, "sources": [hit[0].metadata], "direct": True}
+
+        chain = self._chain(language, category, k)
+        # ainvoke liefert (anders als arun) das Dict mit result + source_documents;
+        # ein Abbruch (CancelledError) wird an die Chain durchgereicht
+        result = await asyncio.wait_for(chain.ainvoke({"query": query}, config), timeout=self._timeout)
+        answer = {
             "answer": result["result"],
             "sources": [doc.metadata for doc in result["source_documents"]]
         }
+        self._answer_cache.store(vector, language, category, k, ingest_id, answer)
+        return answer
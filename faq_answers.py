@@ -0,0 +1,156 @@
+# faq_answers.py
+#
+# Antwort-Datensätze der FAQ: jede Antwort liegt genau einmal in einer SQLite-Tabelle,
+# die Paraphrase-Vektoren in Chroma verweisen per `answer_id` darauf. Der Retriever
+# fasst Treffer pro FAQ zusammen, bevor der Kontext für das LLM gebaut wird.
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+ANSWERS_FILE = "faq_answers.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    answer_id TEXT PRIMARY KEY,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+"""
+
+
+class AnswerRecord(NamedTuple):
+    question: str
+    answer: str
+    metadata: Dict[str, Any]
+
+
+class FaqAnswerStore:
+    """Antworten pro `answer_id`; liegt neben der Chroma-DB (`<persist_directory>/faq_answers.sqlite`)."""
+
+    def __init__(self, persist_directory: str):
+        os.makedirs(persist_directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(persist_directory, ANSWERS_FILE), check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def put(self, answer_id: str, question: str, answer: str, metadata: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (answer_id, question, answer, metadata) VALUES (?, ?, ?, ?)",
+                (answer_id, question, answer, json.dumps(metadata, ensure_ascii=False))
+            )
+            self._conn.commit()
+
+    def delete(self, answer_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM answers WHERE answer_id = ?", [(i,) for i in answer_ids])
+            self._conn.commit()
+
+    def get_many(self, answer_ids: List[str]) -> Dict[str, AnswerRecord]:
+        if not answer_ids:
+            return {}
+        placeholders = ",".join("?" * len(answer_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT answer_id, question, answer, metadata FROM answers WHERE answer_id IN ({placeholders})",
+                answer_ids
+            ).fetchall()
+        return {row[0]: AnswerRecord(row[1], row[2], json.loads(row[3])) for row in rows}
+
+
+def faq_key(doc: Document) -> Optional[str]:
+    """Identität der FAQ-Einheit eines Treffers: answer_id, bei alten Collections die Frage ("id")."""
+    return doc.metadata.get("answer_id") or doc.metadata.get("id")
+
+
+def collapse_hits(hits: List[Tuple[Document, float]], k: int) -> List[Tuple[Document, float]]:
+    """Bester Treffer pro FAQ (siehe `faq_key`), höchstens `k`, Reihenfolge bleibt erhalten."""
+    seen = set()
+    collapsed = []
+    for doc, score in hits:
+        key = faq_key(doc)
+        if key in seen:
+            continue
+        seen.add(key)
+        collapsed.append((doc, score))
+        if len(collapsed) >= k:
+            break
+    return collapsed
+
+
+def fuse_rrf(rankings: List[List[Tuple[Document, float]]], k: int = 60) -> List[Tuple[Document, float]]:
+    """
+    Reciprocal Rank Fusion mehrerer Trefferlisten (z. B. BM25 + Vektorsuche) pro FAQ:
+    score = Σ 1 / (k + Rang). Nur die Ränge zählen, die Skalen der Scores sind egal.
+    """
+    fused: Dict[str, List[Any]] = {}
+    for ranking in rankings:
+        for rank, (doc, _) in enumerate(collapse_hits(ranking, len(ranking)), start=1):
+            entry = fused.setdefault(faq_key(doc) or doc.id, [doc, 0.0])
+            entry[1] += 1.0 / (k + rank)
+    return sorted(((doc, score) for doc, score in fused.values()), key=lambda hit: -hit[1])
+
+
+def resolve_answers(
+    hits: List[Tuple[Document, float]], store: Optional[FaqAnswerStore]
+) -> List[Tuple[Document, float]]:
+    """
+    Ersetzt Paraphrase-Treffer durch "Q: <Frage>\\nA: <Antwort>" aus dem Antwort-Datensatz.
+    Dokumente ohne `answer_id` (alte Collections mit Antwort im Text) bleiben unverändert.
+    """
+    records = store.get_many([d.metadata["answer_id"] for d, _ in hits if d.metadata.get("answer_id")]) if store else {}
+    resolved = []
+    for doc, score in hits:
+        record = records.get(doc.metadata.get("answer_id"))
+        if record is not None:
+            doc = Document(
+                page_content=f"Q: {record.question}\nA: {record.answer}",
+                metadata={**record.metadata, **doc.metadata},
+                id=doc.id
+            )
+        resolved.append((doc, score))
+    return resolved
+
+
+class CollapsingFaqRetriever(BaseRetriever):
+    """
+    Holt `fetch_k` Paraphrasen, fasst sie pro FAQ zusammen und liefert die `k` besten
+    FAQs mit ihrer (einmal gespeicherten) Antwort – zwei Paraphrasen derselben FAQ
+    belegen also nicht mehr zwei Kontext-Plätze. Mit `lexical` (BM25-Suche, siehe
+    faq_lexical.py) werden beide Ranglisten per RRF fusioniert.
+    """
+
+    search: Callable[..., List[Tuple[Document, float]]]
+    embeddings: Embeddings
+    answers: Any = None
+    k: int = 2
+    fetch_k: int = 16
+    language: Optional[str] = None
+    category: Optional[str] = None
+    lexical: Optional[Callable[..., List[Tuple[Document, float]]]] = None
+
+    def _collect(self, query: str, vector: List[float]) -> List[Document]:
+        fetch_k = max(self.fetch_k, self.k)
+        hits = self.search(vector, fetch_k, self.language, self.category)
+        if self.lexical is not None:
+            lexical_hits = self.lexical(query, fetch_k, self.language, self.category)
+            if lexical_hits:
+                hits = fuse_rrf([hits, lexical_hits])
+        return [doc for doc, _ in resolve_answers(collapse_hits(hits, self.k), self.answers)]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self._collect(query, self.embeddings.embed_query(query))
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: Any) -> List[Document]:
+        return self._collect(query, await self.embeddings.aembed_query(query))
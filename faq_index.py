@@ -0,0 +1,120 @@
+# faq_index.py
+#
+# In-Process-Vektorindex für den (kleinen) FAQ-Korpus: alle Embeddings liegen in einer
+# zusammenhängenden float32-Matrix, sortiert nach Sprache und Kategorie, sodass jede
+# Partition ein Slice ist. Top-k = ein Matrix-Vektor-Produkt + argpartition.
+
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+class _IndexData(NamedTuple):
+    matrix: np.ndarray                      # (n, dim), zeilenweise L2-normalisiert
+    documents: List[Document]
+    slices: Dict[Tuple[str, Optional[str]], slice]  # (Sprache, Kategorie|None) → Zeilenbereich
+    by_category: Dict[str, np.ndarray]      # Kategorie → Zeilenindizes (über alle Sprachen)
+
+
+class NumpyFaqIndex:
+    """
+    Hält die Embeddings einer Chroma-Collection im Speicher. `load` liest die Collection
+    (neu) ein und tauscht den Index atomar aus; laufende Suchen sehen entweder den alten
+    oder den neuen Stand.
+    """
+
+    def __init__(self, collection: Any = None):
+        self._data: Optional[_IndexData] = None
+        self._lock = threading.Lock()
+        if collection is not None:
+            self.load(collection)
+
+    def load(self, collection: Any) -> int:
+        """Liest alle Einträge einer Chroma-Collection (chromadb.Collection) ein."""
+        raw = collection.get(include=["embeddings", "documents", "metadatas"])
+        rows = sorted(
+            zip(raw["ids"], raw["embeddings"], raw["documents"], raw["metadatas"]),
+            key=lambda r: ((r[3] or {}).get("language") or "", (r[3] or {}).get("category") or "")
+        )
+        with self._lock:
+            self._data = self._build(rows)
+        return len(rows)
+
+    @property
+    def size(self) -> int:
+        data = self._data
+        return len(data.documents) if data else 0
+
+    def nbytes(self) -> int:
+        data = self._data
+        return data.matrix.nbytes if data else 0
+
+    def search(
+        self,
+        vector: List[float],
+        k: int = 4,
+        language: Optional[str] = None,
+        category: Optional[str] = None
+    ) -> List[Tuple[Document, float]]:
+        """Top-k nach Kosinus-Ähnlichkeit, absteigend, optional gefiltert."""
+        data = self._data
+        if data is None or k <= 0:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        rows = self._rows(data, language, category)
+        if rows is None:
+            return []
+        matrix = data.matrix[rows]
+        if not len(matrix):
+            return []
+        scores = matrix @ query
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+        else:
+            top = np.argsort(-scores)
+        return [(data.documents[self._offset(rows, int(i))], float(scores[i])) for i in top]
+
+    # --- Interne Helfer ---
+    @staticmethod
+    def _offset(rows: Any, i: int) -> int:
+        return rows.start + i if isinstance(rows, slice) else int(rows[i])
+
+    @staticmethod
+    def _rows(data: _IndexData, language: Optional[str], category: Optional[str]):
+        if language:
+            return data.slices.get((language, category))
+        if category:
+            return data.by_category.get(category)
+        return slice(0, len(data.documents))
+
+    @staticmethod
+    def _build(rows: List[tuple]) -> _IndexData:
+        if not rows:
+            return _IndexData(np.zeros((0, 0), dtype=np.float32), [], {}, {})
+        matrix = np.ascontiguousarray(np.asarray([r[1] for r in rows], dtype=np.float32))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+
+        documents = [
+            Document(page_content=text or "", metadata=dict(meta or {}), id=doc_id)
+            for doc_id, _, text, meta in rows
+        ]
+        slices: Dict[Tuple[str, Optional[str]], slice] = {}
+        categories: Dict[str, List[int]] = {}
+        for i, doc in enumerate(documents):
+            lang = doc.metadata.get("language") or ""
+            cat = doc.metadata.get("category") or ""
+            # Zeilen sind nach (Sprache, Kategorie) sortiert → jeweils zusammenhängend
+            for key in ((lang, None), (lang, cat)):
+                current = slices.get(key)
+                slices[key] = slice(current.start if current else i, i + 1)
+            categories.setdefault(cat, []).append(i)
+        by_category = {cat: np.asarray(idx, dtype=np.intp) for cat, idx in categories.items()}
+        return _IndexData(matrix, documents, slices, by_category)
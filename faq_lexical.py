@@ -0,0 +1,157 @@
+# faq_lexical.py
+#
+# Lexikalische erste Stufe der FAQ-Suche: ein BM25-Index (tantivy, im Speicher) pro
+# Sprache über die Q/A-Einheiten. Eindeutige Stichwort-Anfragen ("Datenschutz", "Kosten")
+# kommen ohne Query-Embedding aus; unklare Anfragen eskaliert FaqTool an die Vektorsuche
+# und kombiniert beide Listen per Reciprocal Rank Fusion (faq_answers.fuse_rrf).
+
+import re
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from faq_answers import FaqAnswerStore, faq_key
+
+try:
+    import tantivy
+except ImportError:
+    tantivy = None
+
+# tantivy-py bringt nur für Englisch einen Stemmer mit; sonst Kleinschreibung + Wortgrenzen
+TOKENIZERS = {"en": "en_stem"}
+DEFAULT_TOKENIZER = "default"
+# Paraphrasen zählen mehr als Kategorie/Tags, diese mehr als der Antworttext
+FIELD_BOOSTS = {"question": 2.0, "keywords": 1.5, "answer": 1.0}
+# Mindestgröße des tantivy-Schreibpuffers (ein Thread)
+WRITER_HEAP_SIZE = 15_000_000
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+class _LanguageIndex(NamedTuple):
+    index: Any                  # tantivy.Index
+    documents: List[Document]   # Zeile → Stellvertreter-Dokument der Q/A-Einheit
+
+
+def lexical_confident(hits: List[Tuple[Document, float]], min_score: float, ratio: float) -> bool:
+    """
+    Lexikalisches Ergebnis reicht ohne Embedding: bester BM25-Score >= `min_score` und
+    mindestens `ratio`-mal so hoch wie der beste Treffer aus einer *anderen* FAQ-Datei.
+    Einheiten derselben Datei (z. B. alle Fragen zu "Kosten") konkurrieren nicht.
+    """
+    if not hits or hits[0][1] < min_score:
+        return False
+    top_file = _source(hits[0][0])
+    runner_up = next((score for doc, score in hits[1:] if _source(doc) != top_file), None)
+    return runner_up is None or hits[0][1] >= ratio * runner_up
+
+
+def _source(doc: Document) -> Optional[str]:
+    return doc.metadata.get("source_file") or faq_key(doc)
+
+
+class FaqLexicalIndex:
+    """
+    BM25 über die Q/A-Einheiten einer Chroma-Collection, ein In-Memory-Index pro Sprache.
+    Pro Einheit und Sprache ein tantivy-Dokument: alle Paraphrasen der Sprache, Kategorie
+    und Tags, in der Quellsprache zusätzlich die Antwort. `load` baut alle Indizes neu und
+    tauscht sie atomar aus. `index_keywords=False` lässt Kategorie/Tags weg (Benchmark mit
+    Stichwort-Anfragen aus genau diesen Feldern).
+    """
+
+    def __init__(self, source_language: str = "de", index_keywords: bool = True):
+        self._source_language = source_language
+        self._index_keywords = index_keywords
+        self._indexes: Dict[str, _LanguageIndex] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available() -> bool:
+        return tantivy is not None
+
+    @property
+    def size(self) -> int:
+        return sum(len(entry.documents) for entry in self._indexes.values())
+
+    def load(self, collection: Any, answers: Optional[FaqAnswerStore] = None) -> int:
+        """Liest Paraphrasen (chromadb.Collection) und Antworten ein; liefert die Anzahl Einheiten."""
+        raw = collection.get(include=["documents", "metadatas"])
+        # (Sprache, FAQ-Einheit) → Stellvertreter-Dokument + Paraphrasen
+        units: Dict[Tuple[str, str], Tuple[Document, List[str]]] = {}
+        for doc_id, text, meta in zip(raw["ids"], raw["documents"], raw["metadatas"]):
+            doc = Document(page_content=text or "", metadata=dict(meta or {}), id=doc_id)
+            key = (doc.metadata.get("language") or "", faq_key(doc) or doc_id)
+            entry = units.setdefault(key, (doc, []))
+            entry[1].append(doc.metadata.get("paraphrase") or _question_part(doc.page_content))
+
+        records = answers.get_many(sorted({key for _, key in units})) if answers else {}
+        by_language: Dict[str, List[Tuple[Document, str, str, str]]] = {}
+        for (language, key), (doc, questions) in sorted(units.items()):
+            record = records.get(key)
+            answer = record.answer if record else _answer_part(doc.page_content)
+            keywords = ""
+            if self._index_keywords:
+                keywords = " ".join(str(doc.metadata.get(f) or "") for f in ("category", "tags"))
+            by_language.setdefault(language, []).append(
+                (doc, "\n".join(questions), answer if language == self._source_language else "", keywords)
+            )
+
+        indexes = {language: self._build(language, rows) for language, rows in by_language.items()}
+        with self._lock:
+            self._indexes = indexes
+        return len(units)
+
+    def search(
+        self,
+        query: str,
+        k: int = 4,
+        language: Optional[str] = None,
+        category: Optional[str] = None
+    ) -> List[Tuple[Document, float]]:
+        """Top-k Einheiten nach BM25, absteigend; ohne Sprache wird die Quellsprache durchsucht."""
+        entry = self._indexes.get(language or self._source_language)
+        # Nur Wörter übernehmen: Sonderzeichen der tantivy-Query-Syntax sind so ausgeschlossen
+        terms = _TERM.findall(query.lower())
+        if entry is None or not terms or k <= 0:
+            return []
+        parsed = entry.index.parse_query(" ".join(terms), list(FIELD_BOOSTS), field_boosts=FIELD_BOOSTS)
+        searcher = entry.index.searcher()
+        # Kategorie wird nachgefiltert – der Korpus ist klein genug, um alles zu holen
+        limit = len(entry.documents) if category else k
+        hits = []
+        for score, address in searcher.search(parsed, limit).hits:
+            doc = entry.documents[searcher.doc(address)["row"][0]]
+            if category and doc.metadata.get("category") != category:
+                continue
+            hits.append((doc, float(score)))
+            if len(hits) >= k:
+                break
+        return hits
+
+    # --- Interne Helfer ---
+    @staticmethod
+    def _build(language: str, rows: List[Tuple[Document, str, str, str]]) -> _LanguageIndex:
+        tokenizer = TOKENIZERS.get(language, DEFAULT_TOKENIZER)
+        builder = tantivy.SchemaBuilder()
+        builder.add_integer_field("row", stored=True)
+        for field in FIELD_BOOSTS:
+            builder.add_text_field(field, tokenizer_name=tokenizer)
+        index = tantivy.Index(builder.build())
+        writer = index.writer(heap_size=WRITER_HEAP_SIZE, num_threads=1)
+        for row, (_, questions, answer, keywords) in enumerate(rows):
+            writer.add_document(tantivy.Document(row=row, question=questions, answer=answer, keywords=keywords))
+        writer.commit()
+        index.reload()
+        return _LanguageIndex(index, [doc for doc, *_ in rows])
+
+
+def _question_part(text: str) -> str:
+    # Alt-Bestand: "Q: <Frage>\nA: <Antwort>" im Dokumenttext
+    question, _, _ = text.partition("\nA:")
+    return question[2:].strip() if question.startswith("Q:") else question.strip()
+
+
+def _answer_part(text: str) -> str:
+    _, _, answer = text.partition("\nA:")
+    return answer.strip()
@@ -1,13 +1,17 @@
 from dotenv import load_dotenv
-import os, yaml
+import os, re, yaml, json, hashlib, argparse, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, NamedTuple
 from uuid import uuid4
 from langchain_core.documents import Document
-from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
-from langchain_community.chat_models import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
 
+from embedding_cache import get_embeddings
+from faq_answers import FaqAnswerStore
+from llm_gateway import get_llm_gateway
+
 # --- Environment & API Key ---
 load_dotenv()
 
@@ -15,6 +19,15 @@ load_dotenv()
 FAQ_DIR     = "documents/FAQ"
 PERSIST_DIR = "./chroma_langchain_db"
 COLLECTION  = "example_collection"
+# Manifest liegt neben der Chroma-DB: wird das Verzeichnis gelöscht, ist auch das Manifest weg
+MANIFEST    = os.path.join(PERSIST_DIR, "faq_manifest.json")
+# Bereits generierte Varianten eines abgebrochenen Laufs (wird nach Erfolg gelöscht)
+CHECKPOINT  = os.path.join(PERSIST_DIR, "faq_variants.jsonl")
+
+# Parallelität der Übersetzung/Paraphrasierung (das LLM-Gateway begrenzt zusätzlich global)
+WORKERS     = int(os.getenv("INGEST_WORKERS", "8"))
+# Dokumente pro Embedding-Request bzw. Schreibvorgang in Chroma
+BATCH_SIZE  = int(os.getenv("INGEST_BATCH_SIZE", "64"))
 
 # Mehrsprachigkeit
 languages = {
@@ -26,83 +39,366 @@ languages = {
 }
 
 # --- LLM & Embeddings ---
-llm        = ChatOpenAI(temperature=0)
-embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+llm        = get_llm_gateway().chat_model(temperature=0)
+embeddings = get_embeddings("text-embedding-3-small")
 
 # --- Chains definieren ---
+TRANSLATION_TEMPLATE = "Übersetze ins {target_language}: {text}"
+PARAPHRASE_TEMPLATE  = """
+Formuliere 3 alternative, gängige Fragestellungen auf {language} zu:
+{question}
+Gib jede Paraphrase in einer neuen Zeile aus.
+"""
 translation_chain = LLMChain(
     llm=llm,
     prompt=PromptTemplate(
         input_variables=["text","target_language"],
-        template="Übersetze ins {target_language}: {text}"
+        template=TRANSLATION_TEMPLATE
     )
 )
 paraphrase_chain = LLMChain(
     llm=llm,
     prompt=PromptTemplate(
         input_variables=["question","language"],
-        template="""
-Formuliere 3 alternative, gängige Fragestellungen auf {language} zu:
-{question}
-Gib jede Paraphrase in einer neuen Zeile aus.
-"""
+        template=PARAPHRASE_TEMPLATE
     )
 )
 
-# --- Einlesen & Paraphrasieren ---
-docs = []
-for fname in os.listdir(FAQ_DIR):
-    if not fname.endswith(".txt"):
-        continue
-    raw = open(os.path.join(FAQ_DIR, fname), encoding="utf-8", errors="ignore").read().strip()
+# Speicherformat: 2 = Antwort einmal im Antwort-Datensatz, Chroma hält nur Paraphrasen;
+# 3 = eine Einheit pro Q/A-Block statt einer pro Datei
+STORAGE_VERSION = 3
+
+# Ändern sich Sprachen, Prompts oder Speicherformat, gelten alle Dateien als geändert
+PIPELINE_VERSION = hashlib.sha256(
+    json.dumps([languages, TRANSLATION_TEMPLATE, PARAPHRASE_TEMPLATE, STORAGE_VERSION], sort_keys=True).encode("utf-8")
+).hexdigest()[:12]
+
+
+def file_hash(raw: str) -> str:
+    """Hash über Dateiinhalt (inkl. Frontmatter) und Pipeline-Version."""
+    return hashlib.sha256(f"{PIPELINE_VERSION}\n{raw}".encode("utf-8")).hexdigest()
+
+
+class FaqUnit(NamedTuple):
+    section: int        # 1-basiert, Reihenfolge in der Datei
+    question: str
+    answer: str
 
+
+# Neuer Q/A-Block beginnt mit einer "Q:"-Zeile; "---"-Zeilen trennen Blöcke nur optisch
+_QUESTION_LINE = re.compile(r"^Q:\s*(.*)$")
+_SEPARATOR_LINE = re.compile(r"^\s*-{3,}\s*$")
+
+
+def parse_faq(raw: str):
+    """
+    Liefert (Frontmatter-Metadaten, Q/A-Einheiten) einer FAQ-Datei. Dateien mit mehreren
+    "Q:"/"A:"-Blöcken ergeben eine Einheit pro Block; Dateien ohne "Q:" werden wie
+    bisher als eine Frage (erste Zeile bzw. erster Absatz) mit Antwort gelesen.
+    """
     # Frontmatter (optional)
     metadata = {}
     if raw.startswith("---"):
         _, fm, body = raw.split("---", 2)
-        metadata.update(yaml.safe_load(fm))
+        metadata.update(yaml.safe_load(fm) or {})
         if "tags" in metadata and isinstance(metadata["tags"], list):
             metadata["tags"] = ", ".join(metadata["tags"])
     else:
         body = raw
 
-    # Frage/Antwort extrahieren
+    blocks = []
+    for line in body.strip().splitlines():
+        match = _QUESTION_LINE.match(line)
+        if match:
+            blocks.append([match.group(1).strip(), []])
+        elif blocks and not _SEPARATOR_LINE.match(line):
+            blocks[-1][1].append(line)
+    if blocks:
+        units = []
+        for question, lines in blocks:
+            answer = "\n".join(lines).strip()
+            if answer.startswith("A:"):
+                answer = answer[2:].strip()
+            units.append(FaqUnit(len(units) + 1, question, answer))
+        return metadata, units
+
+    # Ohne "Q:"-Markierung: erste Zeile (Frage mit "?") bzw. erster Absatz als Frage
+    body = body.strip()
     lines = body.splitlines()
-    if lines and lines[0].startswith("Q:"):
-        question = lines[0][2:].strip()
-        answer   = "\n".join(lines[1:]).strip()
-    elif lines and lines[0].endswith("?"):
+    if lines and lines[0].endswith("?"):
         question = lines[0].strip()
         answer   = "\n".join(lines[1:]).strip()
     else:
         parts    = body.split("\n\n", 1)
         question = parts[0].strip()
         answer   = parts[1].strip() if len(parts)>1 else ""
+    return metadata, [FaqUnit(1, question, answer)]
+
+
+def unit_id(fname: str, section: int) -> str:
+    """answer_id einer Q/A-Einheit, z. B. "Answertime.txt#2"."""
+    return f"{fname}#{section}"
+
+
+def generate_variants(question: str, code: str):
+    """Übersetzung + Paraphrasen einer Frage in einer Sprache (2 LLM-Aufrufe, für DE einer)."""
+    name = languages[code]
+    translation = (
+        translation_chain.run(text=question, target_language=name).strip()
+        if code != "de" else question
+    )
+    para_text = paraphrase_chain.run(question=translation, language=name)
+    return [translation] + [p.strip("- ").strip() for p in para_text.splitlines() if p.strip()]
+
+
+def build_documents(fname: str, raw: str, variants_by_unit: dict):
+    """
+    Paraphrase-Dokumente einer FAQ-Datei plus ein Antwort-Datensatz pro Q/A-Einheit.
+    `variants_by_unit` bildet (Abschnitt, Sprache) auf die Varianten ab. Die Dokumente
+    enthalten nur die Frage-Variante und verweisen per answer_id auf die Antwort;
+    IDs sind pro Datei und Abschnitt stabil (Upsert).
+    """
+    metadata, units = parse_faq(raw)
+    file_meta = {**metadata, "source_file": fname, "sections": len(units)}
+    # Frontmatter-"question" beschreibt die Datei, nicht jede einzelne Einheit
+    if "question" in file_meta:
+        file_meta["file_question"] = file_meta.pop("question")
+    docs, records = [], []
+    for unit in units:
+        answer_id = unit_id(fname, unit.section)
+        unit_meta = {**file_meta, "section": unit.section}
+        records.append({"answer_id": answer_id, "question": unit.question, "answer": unit.answer,
+                        "metadata": {**unit_meta, "question": unit.question}})
+        for code in languages:
+            for i, variant in enumerate(variants_by_unit[(unit.section, code)]):
+                doc_meta = {**unit_meta, "id": unit.question, "paraphrase": variant,
+                            "language": code, "answer_id": answer_id}
+                docs.append(Document(page_content=f"Q: {variant}", metadata=doc_meta, id=f"{answer_id}:{code}:{i}"))
+    return docs, records
+
+
+def embedding_text(doc: Document, answers: dict) -> str:
+    # Eingebettet wird weiterhin Frage + Antwort; gespeichert wird nur die Frage
+    return f"{doc.page_content}\nA: {answers[doc.metadata['answer_id']]}"
 
-    # Varianten pro Sprache
-    for code, name in languages.items():
-        translation = (
-            translation_chain.run(text=question, target_language=name).strip()
-            if code != "de" else question
+
+def load_checkpoint(hashes: dict) -> dict:
+    """(Datei, Abschnitt, Sprache) → Varianten aus einem abgebrochenen Lauf, sofern die Datei unverändert ist."""
+    done = {}
+    if not os.path.exists(CHECKPOINT):
+        return done
+    with open(CHECKPOINT, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # halb geschriebene letzte Zeile
+            if hashes.get(entry["file"]) == entry["hash"]:
+                done[(entry["file"], entry.get("section", 1), entry["language"])] = entry["variants"]
+    return done
+
+
+class Progress:
+    """Fortschritt und Durchsatz der Pipeline-Stufen auf der Konsole."""
+
+    def __init__(self, files: int, tasks: int):
+        self.started = time.time()
+        self.files, self.tasks = files, tasks
+        self.generated = self.embedded = self.files_done = 0
+        self._last = 0.0
+
+    def report(self, force: bool = False) -> None:
+        now = time.time()
+        if not force and now - self._last < 2:
+            return
+        self._last = now
+        elapsed = max(now - self.started, 1e-6)
+        print(
+            f"[{elapsed:6.1f}s] Dateien {self.files_done}/{self.files} | "
+            f"Generierung {self.generated}/{self.tasks} ({self.generated / elapsed:.1f}/s) | "
+            f"eingebettet {self.embedded} ({self.embedded / elapsed:.1f} Dok./s)",
+            flush=True
         )
-        para_text = paraphrase_chain.run(question=translation, language=name)
-        variants  = [translation] + [p.strip("- ").strip() for p in para_text.splitlines() if p.strip()]
-
-        for variant in variants:
-            content = f"Q: {variant}\nA: {answer}"
-            doc_meta = {"id": question, "paraphrase": variant, "language": code}
-            doc_meta.update(metadata)
-            docs.append(Document(page_content=content, metadata=doc_meta, id=str(uuid4())))
-
-# --- Neuer Flat-Index via from_documents() ---
-# 1) Verzeichnis ./chroma_langchain_db VORHER löschen!
-store = Chroma.from_documents(
-    documents=docs,
-    embedding=embeddings,
-    persist_directory=PERSIST_DIR,
-    collection_name=COLLECTION,
-    # Flat-Index aktivieren
-    collection_metadata={"index_factory": "flat"}
-)
 
-print(f"Ingested {len(docs)} FAQ-Varianten in Collection '{COLLECTION}'.")
+
+def load_manifest(store: Chroma) -> dict:
+    # Leere Collection (z. B. neu angelegt) → alles neu einlesen
+    if not os.path.exists(MANIFEST) or store._collection.count() == 0:
+        return {}
+    with open(MANIFEST, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict) -> None:
+    tmp = MANIFEST + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, MANIFEST)
+
+
+def ingest(workers: int = WORKERS, batch_size: int = BATCH_SIZE) -> dict:
+    """
+    Inkrementeller, paralleler Ingest in drei Stufen:
+      1. Übersetzung + Paraphrasen pro (Q/A-Einheit, Sprache) parallel (max. `workers`)
+      2. Embedding in Batches à `batch_size` Dokumente
+      3. Upsert nach Chroma, sobald ein Batch voll ist
+    Nur neue/geänderte Dateien werden verarbeitet, Einträge gelöschter Dateien entfernt.
+    Fertige Generierungen landen im Checkpoint, fertige Dateien im Manifest – ein
+    abgebrochener Lauf setzt beim nächsten Start dort wieder auf. Ohne Änderungen
+    gibt es keinen einzigen API-Aufruf.
+    """
+    store = Chroma(
+        collection_name=COLLECTION,
+        embedding_function=embeddings,
+        persist_directory=PERSIST_DIR,
+        # Flat-Index aktivieren (nur beim Anlegen der Collection relevant)
+        collection_metadata={"index_factory": "flat"}
+    )
+    answer_store = FaqAnswerStore(PERSIST_DIR)
+    manifest = load_manifest(store)
+    if not manifest and store._collection.count():
+        # Alt-Bestand ohne Manifest (früherer Voll-Import mit Zufalls-IDs) einmalig ersetzen
+        store.delete(ids=store._collection.get(include=[])["ids"])
+
+    current = {}
+    for fname in sorted(os.listdir(FAQ_DIR)):
+        if fname.endswith(".txt"):
+            current[fname] = open(os.path.join(FAQ_DIR, fname), encoding="utf-8", errors="ignore").read().strip()
+
+    counts = {"unchanged": 0, "updated": 0, "added": 0, "deleted": 0, "documents": 0, "resumed": 0}
+    for fname in sorted(set(manifest) - set(current)):
+        entry = manifest.pop(fname)
+        if entry["ids"]:
+            store.delete(ids=entry["ids"])
+        answer_store.delete(entry.get("answers", []))
+        counts["deleted"] += 1
+        save_manifest(manifest)
+
+    hashes = {fname: file_hash(raw) for fname, raw in current.items()}
+    changed = [f for f in current if not (manifest.get(f) and manifest[f]["hash"] == hashes[f])]
+    counts["unchanged"] = len(current) - len(changed)
+
+    units = {f: parse_faq(current[f])[1] for f in changed}
+    # Datei → (Abschnitt, Sprache) → Varianten
+    variants = {f: {} for f in changed}
+    for (fname, section, code), found in load_checkpoint(hashes).items():
+        if fname in variants and section <= len(units[fname]):
+            variants[fname][(section, code)] = found
+            counts["resumed"] += 1
+
+    def generated(fname: str) -> bool:
+        return len(variants[fname]) == len(units[fname]) * len(languages)
+
+    progress = Progress(len(changed), sum(len(u) for u in units.values()) * len(languages))
+    progress.generated = counts["resumed"]
+    pending_docs = {}   # Datei → noch nicht geschriebene Dokument-IDs
+    file_docs = {}      # Datei → alle neuen Dokument-IDs
+    file_answers = {}   # Datei → answer_ids
+    answer_texts = {}   # answer_id → Antwort (nur für die Embedding-Texte)
+    batch = []
+
+    def flush() -> None:
+        # Stufe 2+3: Batch einbetten und per Upsert schreiben; fertige Dateien ins Manifest
+        if not batch:
+            return
+        vectors = embeddings.embed_documents([embedding_text(d, answer_texts) for d in batch])
+        store._collection.upsert(
+            ids=[d.id for d in batch],
+            embeddings=vectors,
+            documents=[d.page_content for d in batch],
+            metadatas=[d.metadata for d in batch]
+        )
+        progress.embedded += len(batch)
+        for doc in batch:
+            fname = doc.metadata["source_file"]
+            pending_docs[fname].discard(doc.id)
+            if not pending_docs[fname]:
+                finish(fname)
+        batch.clear()
+        progress.report()
+
+    def finish(fname: str) -> None:
+        entry = manifest.get(fname)
+        new_ids = file_docs[fname]
+        stale = sorted(set(entry["ids"]) - set(new_ids)) if entry else []
+        if stale:
+            store.delete(ids=stale)
+        stale_answers = set(entry.get("answers", [])) - set(file_answers[fname]) if entry else set()
+        answer_store.delete(stale_answers)
+        manifest[fname] = {"hash": hashes[fname], "ids": new_ids, "answers": file_answers[fname]}
+        save_manifest(manifest)
+        counts["updated" if entry else "added"] += 1
+        counts["documents"] += len(new_ids)
+        progress.files_done += 1
+
+    def complete(fname: str) -> None:
+        # Alle Einheiten und Sprachen einer Datei generiert → Dokumente in den Embedding-Batch
+        docs, records = build_documents(fname, current[fname], variants[fname])
+        # Antwort-Datensätze zuerst schreiben, damit kein Vektor ins Leere zeigt
+        for record in records:
+            answer_store.put(record["answer_id"], record["question"], record["answer"], record["metadata"])
+            answer_texts[record["answer_id"]] = record["answer"]
+        file_answers[fname] = [r["answer_id"] for r in records]
+        file_docs[fname] = [d.id for d in docs]
+        pending_docs[fname] = set(file_docs[fname])
+        for doc in docs:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                flush()
+
+    failed = []
+    os.makedirs(PERSIST_DIR, exist_ok=True)
+    with open(CHECKPOINT, "a", encoding="utf-8") as checkpoint, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for fname in changed:
+            for unit in units[fname]:
+                for code in languages:
+                    if (unit.section, code) not in variants[fname]:
+                        futures[pool.submit(generate_variants, unit.question, code)] = (fname, unit.section, code)
+            if generated(fname):
+                complete(fname)
+
+        # Stufe 1 läuft im Pool weiter, während hier fertige Dateien eingebettet werden
+        for future in as_completed(futures):
+            fname, section, code = futures[future]
+            try:
+                variants[fname][(section, code)] = future.result()
+            except Exception as e:
+                # Weitermachen: alles Erfolgreiche landet im Checkpoint bzw. Manifest
+                print(f"Generierung fehlgeschlagen ({unit_id(fname, section)}, {code}):", e)
+                failed.append((unit_id(fname, section), code, e))
+                continue
+            checkpoint.write(json.dumps(
+                {"file": fname, "hash": hashes[fname], "section": section, "language": code,
+                 "variants": variants[fname][(section, code)]},
+                ensure_ascii=False
+            ) + "\n")
+            checkpoint.flush()
+            progress.generated += 1
+            if generated(fname):
+                complete(fname)
+            progress.report()
+        flush()
+
+    progress.report(force=True)
+    if counts["updated"] or counts["added"] or counts["deleted"]:
+        # Neue ingest_id verwirft den semantischen Antwort-Cache der FaqTool
+        store._collection.modify(metadata={"index_factory": "flat", "ingest_id": str(uuid4())})
+    save_manifest(manifest)
+    if failed:
+        raise RuntimeError(
+            f"{len(failed)} Generierung(en) fehlgeschlagen, z. B. {failed[0][0]} ({failed[0][1]}): {failed[0][2]} – "
+            f"erneut starten, fertige Teile werden übernommen"
+        )
+    # Lauf vollständig → Checkpoint wird nicht mehr gebraucht
+    os.remove(CHECKPOINT)
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FAQ-Dateien inkrementell in die Chroma-Collection übernehmen")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="parallele Übersetzungen/Paraphrasierungen")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Dokumente pro Embedding-Batch")
+    args = parser.parse_args()
+    result = ingest(args.workers, args.batch_size)
+    print(f"FAQ-Ingest in Collection '{COLLECTION}': {result}")
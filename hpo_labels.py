@@ -0,0 +1,164 @@
+# hpo_labels.py
+#
+# Lokales Wörterbuch der HPO-Bezeichnungen (Human Phenotype Ontology) in den
+# Sprachen der App. Quelle sind die Community-Übersetzungen im Babelon-Format
+# (https://github.com/obophenotype/hpo-translations), z. B. hp-de.babelon.tsv.
+# Phänotyp-Namen werden zuerst hier nachgeschlagen; nur was fehlt, geht ans LLM.
+#
+# Import:  python hpo_labels.py <verzeichnis-mit-babelon-tsv> [--db pfad] [--include-candidates]
+
+import argparse
+import csv
+import glob
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+DEFAULT_HPO_LABELS_PATH = "./orphadata_mirror/hpo_labels.sqlite"
+
+# HPO-IDs werden als Zahl gespeichert (HP:0001250 → 1250): kleinere Tabelle, kleinere Dicts
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hpo_labels (
+    hpo_id INTEGER NOT NULL,
+    lang TEXT NOT NULL,
+    label TEXT NOT NULL,
+    PRIMARY KEY (lang, hpo_id)
+) WITHOUT ROWID;
+"""
+
+# Freigegebene Übersetzungen; CANDIDATE nur auf Wunsch
+OFFICIAL_STATUSES = {"OFFICIAL"}
+
+
+def hpo_number(hpo_id: str) -> Optional[int]:
+    """'HP:0001250' → 1250; None für alles, was keine HPO-ID ist."""
+    prefix, _, number = str(hpo_id).strip().partition(":")
+    if prefix.upper() != "HP" or not number.isdigit():
+        return None
+    return int(number)
+
+
+# -------------------------------------------------------------------------------
+# Lookup
+# -------------------------------------------------------------------------------
+class HpoLabels:
+    """
+    Liefert übersetzte HPO-Bezeichnungen per HPO-ID. Jede Sprache wird beim ersten
+    Zugriff einmal komplett in ein Dict geladen (einige Millisekunden), danach sind
+    Lookups reine Dict-Zugriffe.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_HPO_LABELS_PATH):
+        if not os.path.exists(db_path):
+            raise ValueError(f"HPO-Bezeichnungen nicht gefunden: {db_path}")
+        self._db_path = db_path
+        self._by_lang: Dict[str, Dict[int, str]] = {}
+        self._lock = threading.Lock()
+
+    def label(self, hpo_id: str, lang_code: str) -> Optional[str]:
+        number = hpo_number(hpo_id)
+        if number is None:
+            return None
+        return self._labels(lang_code).get(number)
+
+    def lookup(self, hpo_ids: Iterable[str], lang_code: str) -> Dict[str, str]:
+        """Bekannte Bezeichnungen für `hpo_ids`; fehlende IDs sind nicht im Ergebnis."""
+        labels = self._labels(lang_code)
+        found = {}
+        for hpo_id in hpo_ids:
+            number = hpo_number(hpo_id)
+            if number in labels:
+                found[hpo_id] = labels[number]
+        return found
+
+    def _labels(self, lang_code: str) -> Dict[int, str]:
+        lang = lang_code.upper()
+        labels = self._by_lang.get(lang)
+        if labels is not None:
+            return labels
+        with self._lock:
+            if lang not in self._by_lang:
+                conn = sqlite3.connect(f"file:{self._db_path}?mode=ro", uri=True)
+                try:
+                    self._by_lang[lang] = dict(
+                        conn.execute("SELECT hpo_id, label FROM hpo_labels WHERE lang = ?", (lang,))
+                    )
+                finally:
+                    conn.close()
+            return self._by_lang[lang]
+
+
+# -------------------------------------------------------------------------------
+# Import
+# -------------------------------------------------------------------------------
+def import_babelon(conn: sqlite3.Connection, path: str, statuses: Optional[set] = None) -> int:
+    """Übernimmt die rdfs:label-Übersetzungen einer Babelon-TSV-Datei."""
+    statuses = statuses or OFFICIAL_STATUSES
+    count = 0
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            if row.get("predicate_id") != "rdfs:label":
+                continue
+            status = (row.get("translation_status") or "OFFICIAL").upper()
+            number = hpo_number(row.get("subject_id", ""))
+            label = (row.get("translation_value") or "").strip()
+            lang = (row.get("translation_language") or "").strip().upper()
+            if status not in statuses or number is None or not label or not lang:
+                continue
+            conn.execute(
+                "INSERT OR REPLACE INTO hpo_labels (hpo_id, lang, label) VALUES (?, ?, ?)",
+                (number, lang, label)
+            )
+            count += 1
+    return count
+
+
+def import_translations(
+    source_dir: str,
+    db_path: str = DEFAULT_HPO_LABELS_PATH,
+    include_candidates: bool = False
+) -> Dict[str, int]:
+    """Importiert alle *.babelon.tsv aus `source_dir`; Ergebnis: Anzahl Bezeichnungen pro Datei."""
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    statuses = OFFICIAL_STATUSES | ({"CANDIDATE"} if include_candidates else set())
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+
+    counts = {}
+    with conn:
+        for path in sorted(glob.glob(os.path.join(source_dir, "*.babelon.tsv"))):
+            counts[os.path.basename(path)] = import_babelon(conn, path, statuses)
+    conn.execute("VACUUM")
+    conn.close()
+    return counts
+
+
+_labels: Optional[HpoLabels] = None
+_labels_lock = threading.Lock()
+
+
+def get_hpo_labels() -> Optional[HpoLabels]:
+    """Geteiltes Wörterbuch; None, wenn keine HPO-Übersetzungen importiert wurden."""
+    global _labels
+    db_path = os.getenv("HPO_LABELS_PATH", DEFAULT_HPO_LABELS_PATH)
+    with _labels_lock:
+        if _labels is None and os.path.exists(db_path):
+            _labels = HpoLabels(db_path)
+        return _labels
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HPO-Übersetzungen (Babelon-TSV) ins lokale Wörterbuch importieren")
+    parser.add_argument("source_dir", help="Verzeichnis mit hp-<sprache>.babelon.tsv")
+    parser.add_argument("--db", default=DEFAULT_HPO_LABELS_PATH, help="Zieldatei der SQLite-Datenbank")
+    parser.add_argument("--include-candidates", action="store_true",
+                        help="Auch noch nicht freigegebene Übersetzungen (CANDIDATE) übernehmen")
+    args = parser.parse_args()
+
+    started = time.time()
+    result = import_translations(args.source_dir, args.db, args.include_candidates)
+    print(f"Import nach '{args.db}' in {time.time() - started:.1f}s: {result}")
@@ -0,0 +1,187 @@
+# http_client.py
+
+import asyncio
+import random
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple, Union
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+Timeout = Union[float, Tuple[float, float]]
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# Timeouts pro Endpoint-Präfix: (Connect, Read) in Sekunden
+DEFAULT_TIMEOUTS: Dict[str, Timeout] = {
+    "https://api.orphadata.com": (3.05, 5),
+    "https://www.wikidata.org": (3.05, 5),
+    "https://query.wikidata.org/sparql": (3.05, 10),
+}
+
+
+def _timeout_for(timeouts: Dict[str, Timeout], default: Timeout, url: str) -> Timeout:
+    """Timeout des längsten passenden Endpoint-Präfixes."""
+    matches = [prefix for prefix in timeouts if url.startswith(prefix)]
+    if not matches:
+        return default
+    return timeouts[max(matches, key=len)]
+
+
+class HttpClient:
+    """
+    Gemeinsamer HTTP-Client für alle Orphadata- und Wikidata-Aufrufe.
+    Hält Keep-Alive-Verbindungen in einem Pool pro Host, fordert gzip an,
+    wiederholt fehlgeschlagene GETs mit Backoff + Jitter und wählt den
+    Timeout anhand des Endpoints.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = 10,
+        pool_maxsize: int = 20,
+        retries: int = 3,
+        backoff_factor: float = 0.3,
+        backoff_jitter: float = 0.2,
+        timeouts: Optional[Dict[str, Timeout]] = None,
+        default_timeout: Timeout = 5,
+    ):
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            backoff_jitter=backoff_jitter,
+            status_forcelist=RETRY_STATUS,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            respect_retry_after_header=True,
+            # Nach dem letzten Versuch die Antwort zurückgeben, Status behandeln die Tools
+            raise_on_status=False,
+        )
+        # pool_connections = Anzahl Host-Pools, pool_maxsize = Verbindungen pro Host
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry,
+        )
+        self._session = requests.Session()
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._session.headers.update({"Accept-Encoding": "gzip, deflate"})
+
+        self._timeouts = dict(DEFAULT_TIMEOUTS if timeouts is None else timeouts)
+        self._default_timeout = default_timeout
+
+    def timeout_for(self, url: str) -> Timeout:
+        return _timeout_for(self._timeouts, self._default_timeout, url)
+
+    def get(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[Timeout] = None,
+    ) -> requests.Response:
+        return self._session.get(
+            url,
+            params=params,
+            headers=headers,
+            timeout=timeout if timeout is not None else self.timeout_for(url),
+        )
+
+    def close(self) -> None:
+        self._session.close()
+
+
+class AsyncHttpClient:
+    """
+    Asynchrones Gegenstück zu HttpClient (httpx): gleicher Verbindungs-Pool pro Host,
+    gzip, Retries mit Backoff + Jitter und Timeouts pro Endpoint – aber ohne den
+    Event-Loop zu blockieren.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        retries: int = 3,
+        backoff_factor: float = 0.3,
+        backoff_jitter: float = 0.2,
+        timeouts: Optional[Dict[str, Timeout]] = None,
+        default_timeout: Timeout = 5,
+    ):
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+            headers={"Accept-Encoding": "gzip, deflate"},
+        )
+        self._retries = retries
+        self._backoff_factor = backoff_factor
+        self._backoff_jitter = backoff_jitter
+        self._timeouts = dict(DEFAULT_TIMEOUTS if timeouts is None else timeouts)
+        self._default_timeout = default_timeout
+
+    def timeout_for(self, url: str) -> Timeout:
+        return _timeout_for(self._timeouts, self._default_timeout, url)
+
+    async def get(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[Timeout] = None,
+    ) -> httpx.Response:
+        timeout = timeout if timeout is not None else self.timeout_for(url)
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+
+        for attempt in range(self._retries + 1):
+            last_attempt = attempt == self._retries
+            try:
+                resp = await self._client.get(url, params=params, headers=headers, timeout=timeout)
+            except httpx.TransportError:
+                if last_attempt:
+                    raise
+            else:
+                if resp.status_code not in RETRY_STATUS or last_attempt:
+                    return resp
+            # Exponentieller Backoff mit Jitter (wie urllib3.Retry)
+            delay = self._backoff_factor * (2 ** attempt) + random.uniform(0, self._backoff_jitter)
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+_default_client: Optional[HttpClient] = None
+_default_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """Prozessweit geteilter Client, damit alle Tools denselben Pool nutzen."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
+
+
+# httpx-Clients sind an ihren Event-Loop gebunden → ein Client pro Loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncHttpClient]" = weakref.WeakKeyDictionary()
+
+
+def get_async_http_client() -> AsyncHttpClient:
+    """Geteilter asynchroner Client für den laufenden Event-Loop."""
+    loop = asyncio.get_running_loop()
+    with _default_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = AsyncHttpClient()
+            _async_clients[loop] = client
+        return client
@@ -0,0 +1,406 @@
+# llm_gateway.py
+#
+# Zentraler Zugang zu OpenAI für alle LLM-Aufrufe (Übersetzung, FAQ, Ingestion):
+# ein gepoolter Client pro Prozess, globales Parallelitätslimit, Token-Bucket
+# gegen Rate-Limits, Zusammenlegen identischer laufender Prompts und Metriken.
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+import openai
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import ChatGenerationChunk, ChatResult, LLMResult
+from langchain_core.rate_limiters import BaseRateLimiter
+from langchain_openai import ChatOpenAI
+from pydantic import PrivateAttr
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+
+class TokenBucket:
+    """Thread-sicherer Token-Bucket: `rate` Requests pro Sekunde, Bursts bis `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Nimmt ein Token, wenn möglich (→ 0.0), sonst die Wartezeit bis zum nächsten."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self._rate
+
+
+class _GatewayRateLimiter(BaseRateLimiter):
+    """Hängt LangChain-Modelle an den Token-Bucket des Gateways."""
+
+    def __init__(self, gateway: "LLMGateway"):
+        self._gateway = gateway
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        return self._gateway._wait_for_token(blocking)
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        return await self._gateway._await_token(blocking)
+
+
+class _GatewayChatOpenAI(ChatOpenAI):
+    """
+    ChatOpenAI, das für die Dauer des eigentlichen Requests einen Slot des
+    Parallelitätslimits hält. Freigegeben wird im finally – auch bei Abbruch
+    (CancelledError, asyncio.wait_for-Timeout, getrennte Session) oder einem
+    vorzeitig geschlossenen Stream.
+    """
+
+    _gateway: Any = PrivateAttr(default=None)
+
+    def _generate(
+        self, messages: List[Any], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> ChatResult:
+        if self.streaming:
+            # ChatOpenAI delegiert dann an _stream, das den Slot selbst hält
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        with self._gateway._slot():
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(
+        self, messages: List[Any], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> ChatResult:
+        if self.streaming:
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        async with self._gateway._aslot():
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _stream(
+        self, messages: List[Any], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        with self._gateway._slot():
+            yield from super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _astream(
+        self, messages: List[Any], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        async with self._gateway._aslot():
+            async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+
+
+class _GatewayCallback(BaseCallbackHandler):
+    """Erfasst Latenz und Token-Verbrauch der LangChain-Aufrufe (FAQ, Ingestion)."""
+
+    def __init__(self, gateway: "LLMGateway"):
+        self._gateway = gateway
+        self._started: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[Any], *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.monotonic()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        started = self._started.pop(run_id, None)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if not usage and response.generations and response.generations[0]:
+            # Gestreamte Antworten: Verbrauch steht in usage_metadata der Nachricht (stream_usage)
+            message = getattr(response.generations[0][0], "message", None)
+            meta = getattr(message, "usage_metadata", None) or {}
+            usage = {"prompt_tokens": meta.get("input_tokens", 0), "completion_tokens": meta.get("output_tokens", 0)}
+        self._gateway._record(
+            time.monotonic() - started if started is not None else 0.0,
+            usage.get("prompt_tokens", 0),
+            usage.get("completion_tokens", 0)
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started.pop(run_id, None)
+        self._gateway._record_error()
+
+
+class LLMGateway:
+    """
+    Teilt einen OpenAI-Client (Keep-Alive-Pool) zwischen allen Sessions.
+    `complete`/`acomplete` begrenzen die gleichzeitig laufenden Requests
+    (`max_concurrency`) und die Request-Rate (Token-Bucket) prozessweit; identische
+    Prompts, die schon unterwegs sind, warten auf dieselbe Antwort statt einen
+    zweiten Request zu schicken. `chat_model` liefert ein geteiltes LangChain-Modell
+    für Chains, das über denselben Bucket gedrosselt und gemessen wird.
+    """
+
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        max_concurrency: int = 8,
+        requests_per_second: float = 5.0,
+        burst: int = 10,
+        timeout: float = 30.0,
+        max_retries: int = 2
+    ):
+        self._model = model
+        self._timeout = timeout
+        self._max_retries = max_retries
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._max_concurrency = max_concurrency
+        self._bucket = TokenBucket(requests_per_second, burst)
+        self._client: Optional[openai.OpenAI] = None
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, openai.AsyncOpenAI]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._chat_models: Dict[Tuple[str, float], ChatOpenAI] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._latencies: deque = deque(maxlen=500)
+        self._stats = {
+            "requests": 0,
+            "coalesced": 0,
+            "errors": 0,
+            "throttled": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+        }
+
+    # --- Clients (lazy, weil openai.api_key erst in agent.py gesetzt wird) ---
+    def client(self) -> openai.OpenAI:
+        with self._lock:
+            if self._client is None:
+                self._client = openai.OpenAI(
+                    api_key=openai.api_key, timeout=self._timeout, max_retries=self._max_retries
+                )
+            return self._client
+
+    def async_client(self) -> openai.AsyncOpenAI:
+        # Ein Client pro Event-Loop: httpx-Verbindungen lassen sich nicht über Loops teilen
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = openai.AsyncOpenAI(
+                    api_key=openai.api_key, timeout=self._timeout, max_retries=self._max_retries
+                )
+                self._async_clients[loop] = client
+            return client
+
+    def chat_model(self, temperature: float = 0, model: Optional[str] = None) -> ChatOpenAI:
+        """
+        Geteiltes LangChain-Chatmodell (für RetrievalQA, LLMChain usw.). Läuft der Aufruf
+        mit einem Streaming-Callback (z. B. LangGraph stream_mode "messages"), streamt das
+        Modell die Tokens automatisch.
+        """
+        key = (model or self._model, temperature)
+        with self._lock:
+            chat_model = self._chat_models.get(key)
+            if chat_model is None:
+                chat_model = _GatewayChatOpenAI(
+                    model=key[0],
+                    temperature=temperature,
+                    api_key=openai.api_key or None,
+                    timeout=self._timeout,
+                    max_retries=self._max_retries,
+                    rate_limiter=_GatewayRateLimiter(self),
+                    callbacks=[_GatewayCallback(self)],
+                    # Token-Verbrauch auch bei gestreamten Antworten mitschicken
+                    stream_usage=True
+                )
+                chat_model._gateway = self
+                self._chat_models[key] = chat_model
+            return chat_model
+
+    # --- Completions ---
+    def complete(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        temperature: float = 0,
+        json_mode: bool = False,
+        timeout: Optional[float] = None
+    ) -> str:
+        key = self._key(prompt, model, temperature, json_mode)
+        future, owner = self._claim(key)
+        if not owner:
+            return future.result()
+
+        try:
+            with self._slot():
+                self._wait_for_token(True)
+                started = time.monotonic()
+                response = self.client().chat.completions.create(
+                    **self._request(prompt, model, temperature, json_mode),
+                    timeout=timeout or self._timeout
+                )
+                content = self._finish(response, started)
+        except BaseException as e:
+            self._fail(key, future, e)
+            raise
+        self._resolve(key, future, content)
+        return content
+
+    async def acomplete(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        temperature: float = 0,
+        json_mode: bool = False,
+        timeout: Optional[float] = None
+    ) -> str:
+        key = self._key(prompt, model, temperature, json_mode)
+        future, owner = self._claim(key)
+        if not owner:
+            # shield: ein Abbruch hier darf den Request des Besitzers nicht abbrechen
+            return await asyncio.shield(asyncio.wrap_future(future))
+
+        try:
+            async with self._aslot():
+                await self._await_token(True)
+                started = time.monotonic()
+                response = await self.async_client().chat.completions.create(
+                    **self._request(prompt, model, temperature, json_mode),
+                    timeout=timeout or self._timeout
+                )
+                content = self._finish(response, started)
+        except BaseException as e:
+            self._fail(key, future, e)
+            raise
+        self._resolve(key, future, content)
+        return content
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            latencies = sorted(self._latencies)
+            stats["in_flight"] = len(self._inflight)
+        stats["max_concurrency"] = self._max_concurrency
+        if latencies:
+            stats["latency_p50"] = latencies[len(latencies) // 2]
+            stats["latency_p95"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            stats["latency_max"] = latencies[-1]
+        return stats
+
+    # --- Interne Helfer ---
+    @contextmanager
+    def _slot(self) -> Iterator[None]:
+        """Hält einen Slot des Parallelitätslimits für die Dauer des Blocks."""
+        self._slots.acquire()
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def _aslot(self) -> AsyncIterator[None]:
+        # Semaphore ist prozessweit (threading) – nicht blockierend pollen, um den Loop frei zu halten
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(0.02)
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def _key(self, prompt: str, model: Optional[str], temperature: float, json_mode: bool) -> str:
+        raw = f"{model or self._model}|{temperature}|{int(json_mode)}|{prompt}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _request(self, prompt: str, model: Optional[str], temperature: float, json_mode: bool) -> Dict[str, Any]:
+        return {
+            "model": model or self._model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            **({"response_format": {"type": "json_object"}} if json_mode else {})
+        }
+
+    def _claim(self, key: str):
+        """(Future, True) für den ersten Aufrufer eines Prompts, sonst das laufende Future."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            return future, True
+
+    def _resolve(self, key: str, future: Future, content: str) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(content)
+
+    def _fail(self, key: str, future: Future, error: BaseException) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._stats["errors"] += 1
+        future.set_exception(error if isinstance(error, Exception) else RuntimeError("LLM-Aufruf abgebrochen"))
+
+    def _finish(self, response: Any, started: float) -> str:
+        usage = getattr(response, "usage", None)
+        self._record(
+            time.monotonic() - started,
+            getattr(usage, "prompt_tokens", 0) or 0,
+            getattr(usage, "completion_tokens", 0) or 0
+        )
+        return response.choices[0].message.content.strip()
+
+    def _record(self, latency: float, prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["prompt_tokens"] += prompt_tokens
+            self._stats["completion_tokens"] += completion_tokens
+            self._latencies.append(latency)
+
+    def _record_error(self) -> None:
+        with self._lock:
+            self._stats["errors"] += 1
+
+    def _wait_for_token(self, blocking: bool) -> bool:
+        wait = self._bucket.try_acquire()
+        if wait and not blocking:
+            return False
+        if wait:
+            with self._lock:
+                self._stats["throttled"] += 1
+        while wait:
+            time.sleep(wait)
+            wait = self._bucket.try_acquire()
+        return True
+
+    async def _await_token(self, blocking: bool) -> bool:
+        wait = self._bucket.try_acquire()
+        if wait and not blocking:
+            return False
+        if wait:
+            with self._lock:
+                self._stats["throttled"] += 1
+        while wait:
+            await asyncio.sleep(wait)
+            wait = self._bucket.try_acquire()
+        return True
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Prozessweites Gateway, konfigurierbar über Umgebungsvariablen."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway(
+                model=os.getenv("LLM_MODEL", DEFAULT_MODEL),
+                max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+                requests_per_second=float(os.getenv("LLM_REQUESTS_PER_SECOND", "5")),
+                burst=int(os.getenv("LLM_BURST", "10")),
+            )
+        return _gateway
@@ -0,0 +1,180 @@
+# orphadata_backend.py
+
+import os
+import threading
+import urllib.parse
+from typing import Any, Optional
+
+import httpx
+import requests
+
+from http_client import HttpClient, AsyncHttpClient, get_http_client, get_async_http_client
+from response_cache import ResponseCache, CACHE_MISS, get_response_cache
+
+ORPHADATA_URL = "https://api.orphadata.com"
+
+
+class OrphadataUnavailable(Exception):
+    """Orphadata ist nicht erreichbar (Timeout, Verbindungsfehler, 5xx, kaputtes JSON)."""
+
+
+class OrphadataApiBackend:
+    """
+    Backend gegen die Live-API api.orphadata.com (mit Response-Cache).
+    Alle Methoden liefern den Inhalt von `data.results` – also dieselbe Form wie die API –
+    oder None, wenn Orphadata nichts zum Namen/Code kennt. Die a*-Varianten sind
+    nicht-blockierend (httpx) und teilen sich den Cache mit den synchronen.
+    """
+
+    def __init__(
+        self,
+        base_url: str = ORPHADATA_URL,
+        http_client: HttpClient = None,
+        cache: ResponseCache = None,
+        async_http_client: AsyncHttpClient = None
+    ):
+        self._base_url = base_url.rstrip("/")
+        self._http = http_client or get_http_client()
+        self._cache = cache or get_response_cache()
+        self._async_http = async_http_client
+
+    def cross_reference_by_name(self, name: str, lang_code: str = "EN") -> Optional[Any]:
+        encoded_name = urllib.parse.quote(name)
+        return self._get_results(
+            "rd-cross-referencing/orphacodes/names",
+            f"/rd-cross-referencing/orphacodes/names/{encoded_name}",
+            name,
+            lang_code
+        )
+
+    def cross_reference(self, orpha_code: str, lang_code: str = "EN") -> Optional[Any]:
+        return self._get_results(
+            "rd-cross-referencing/orphacodes",
+            f"/rd-cross-referencing/orphacodes/{orpha_code}",
+            orpha_code,
+            lang_code
+        )
+
+    def phenotypes(self, orpha_code: str, lang_code: str = "EN") -> Optional[Any]:
+        return self._get_results(
+            "rd-phenotypes",
+            f"/rd-phenotypes/orphacodes/{orpha_code}",
+            orpha_code,
+            lang_code
+        )
+
+    def hchids(self, orpha_code: str, lang_code: str = "EN") -> Optional[Any]:
+        return self._get_results(
+            "rd-classification/hchids",
+            f"/rd-classification/orphacodes/{orpha_code}/hchids",
+            orpha_code,
+            lang_code
+        )
+
+    async def across_reference_by_name(self, name: str, lang_code: str = "EN") -> Optional[Any]:
+        encoded_name = urllib.parse.quote(name)
+        return await self._aget_results(
+            "rd-cross-referencing/orphacodes/names",
+            f"/rd-cross-referencing/orphacodes/names/{encoded_name}",
+            name,
+            lang_code
+        )
+
+    async def across_reference(self, orpha_code: str, lang_code: str = "EN") -> Optional[Any]:
+        return await self._aget_results(
+            "rd-cross-referencing/orphacodes",
+            f"/rd-cross-referencing/orphacodes/{orpha_code}",
+            orpha_code,
+            lang_code
+        )
+
+    async def aphenotypes(self, orpha_code: str, lang_code: str = "EN") -> Optional[Any]:
+        return await self._aget_results(
+            "rd-phenotypes",
+            f"/rd-phenotypes/orphacodes/{orpha_code}",
+            orpha_code,
+            lang_code
+        )
+
+    async def ahchids(self, orpha_code: str, lang_code: str = "EN") -> Optional[Any]:
+        return await self._aget_results(
+            "rd-classification/hchids",
+            f"/rd-classification/orphacodes/{orpha_code}/hchids",
+            orpha_code,
+            lang_code
+        )
+
+    def _get_results(self, cache_endpoint: str, path: str, ident: str, lang_code: str) -> Optional[Any]:
+        # Zuerst im Cache nachsehen (None = negativ gecachter 404)
+        results = self._cache.get(cache_endpoint, ident, lang_code)
+        if results is not CACHE_MISS:
+            return results
+
+        # HTTP-Request mit Timeout- und Connection-Error-Behandlung
+        try:
+            resp = self._http.get(
+                f"{self._base_url}{path}",
+                params={"language": lang_code},
+                headers={"Accept": "application/json"}
+            )
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            raise OrphadataUnavailable(str(e)) from e
+        return self._handle_response(resp, cache_endpoint, path, ident, lang_code)
+
+    async def _aget_results(self, cache_endpoint: str, path: str, ident: str, lang_code: str) -> Optional[Any]:
+        results = self._cache.get(cache_endpoint, ident, lang_code)
+        if results is not CACHE_MISS:
+            return results
+
+        http = self._async_http or get_async_http_client()
+        try:
+            resp = await http.get(
+                f"{self._base_url}{path}",
+                params={"language": lang_code},
+                headers={"Accept": "application/json"}
+            )
+        except httpx.TransportError as e:
+            raise OrphadataUnavailable(str(e)) from e
+        return self._handle_response(resp, cache_endpoint, path, ident, lang_code)
+
+    def _handle_response(self, resp: Any, cache_endpoint: str, path: str, ident: str, lang_code: str) -> Optional[Any]:
+        # HTTP-Fehler behandeln
+        status = resp.status_code
+        if status == 404:
+            self._cache.put_not_found(cache_endpoint, ident, lang_code)
+            return None
+        if 400 <= status < 500:
+            return None
+        if status != 200:
+            raise OrphadataUnavailable(f"HTTP {status} für {path}")
+
+        # JSON parsen
+        try:
+            results = resp.json().get("data", {}).get("results")
+        except ValueError as e:
+            raise OrphadataUnavailable(f"Ungültiges JSON für {path}") from e
+        self._cache.put(cache_endpoint, ident, lang_code, results)
+        return results
+
+
+_mirror = None
+_mirror_lock = threading.Lock()
+
+
+def get_orphadata_backend(
+    base_url: str = ORPHADATA_URL,
+    http_client: HttpClient = None,
+    cache: ResponseCache = None
+):
+    """
+    Wählt das Backend über ORPHADATA_BACKEND: "api" (Standard) oder "mirror"
+    (lokaler SQLite-Spiegel, Pfad über ORPHADATA_MIRROR_PATH).
+    """
+    global _mirror
+    if os.getenv("ORPHADATA_BACKEND", "api").lower() == "mirror":
+        from orphadata_mirror import OrphadataMirror, DEFAULT_MIRROR_PATH
+        with _mirror_lock:
+            if _mirror is None:
+                _mirror = OrphadataMirror(os.getenv("ORPHADATA_MIRROR_PATH", DEFAULT_MIRROR_PATH))
+            return _mirror
+    return OrphadataApiBackend(base_url, http_client=http_client, cache=cache)
@@ -0,0 +1,340 @@
+# orphadata_mirror.py
+#
+# Lokaler Orphanet-Spiegel: importiert die öffentlichen Orphadata-Produktdateien
+# (https://www.orphadata.com) in eine indizierte SQLite-Datenbank und beantwortet
+# dieselben Abfragen wie OrphadataApiBackend – ohne Netzwerk.
+#
+#   {lang}_product1.xml     Nomenklatur, Synonyme, Cross-Referencing, Definitionen
+#   {lang}_product4.xml     HPO-Phänotypen
+#   {lang}_product3_*.xml   Klassifikationen (Eltern/Kind-Beziehungen)
+#
+# Import:  python orphadata_mirror.py <verzeichnis-mit-xml-dateien> [--db pfad]
+
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_MIRROR_PATH = "./orphadata_mirror/orphanet.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS disorders (
+    orpha_code TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    preferred_term TEXT NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (orpha_code, lang)
+);
+CREATE TABLE IF NOT EXISTS names (
+    name_norm TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    orpha_code TEXT NOT NULL,
+    is_preferred INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_names_lookup ON names(name_norm, lang);
+CREATE VIRTUAL TABLE IF NOT EXISTS names_fts USING fts5(
+    name, orpha_code UNINDEXED, lang UNINDEXED, tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS phenotypes (
+    orpha_code TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (orpha_code, lang)
+);
+CREATE TABLE IF NOT EXISTS classification (
+    parent_code TEXT NOT NULL,
+    child_code TEXT NOT NULL,
+    hch_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (parent_code, hch_id, child_code)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(name.casefold().split())
+
+
+# -------------------------------------------------------------------------------
+# Lookup-Backend
+# -------------------------------------------------------------------------------
+class OrphadataMirror:
+    """
+    Read-only-Backend über der lokalen Spiegel-Datenbank. Die Rückgaben haben
+    die Form von `data.results` der Orphadata-API, damit RareDiseaseTool,
+    OrphadataPhenotypeTool und SubtypeResolver unverändert funktionieren.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_MIRROR_PATH, fallback_lang: str = "EN"):
+        if not os.path.exists(db_path):
+            raise ValueError(f"Orphadata-Spiegel nicht gefunden: {db_path}")
+        self._conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._fallback_lang = fallback_lang
+
+    def cross_reference_by_name(self, name: str, lang_code: str = "EN") -> Optional[Any]:
+        orpha_code = self.find_code(name, lang_code)
+        if orpha_code is None:
+            return None
+        return self.cross_reference(orpha_code, lang_code)
+
+    def cross_reference(self, orpha_code: str, lang_code: str = "EN") -> Optional[Any]:
+        row = self._first_lang(
+            "SELECT record FROM disorders WHERE orpha_code = ? AND lang = ?", str(orpha_code), lang_code
+        )
+        return json.loads(row[0]) if row else None
+
+    def phenotypes(self, orpha_code: str, lang_code: str = "EN") -> Optional[Any]:
+        row = self._first_lang(
+            "SELECT payload FROM phenotypes WHERE orpha_code = ? AND lang = ?", str(orpha_code), lang_code
+        )
+        return json.loads(row[0]) if row else None
+
+    def hchids(self, orpha_code: str, lang_code: str = "EN") -> Optional[Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT hch_id, child_code FROM classification WHERE parent_code = ? "
+                "ORDER BY hch_id, position",
+                (str(orpha_code),)
+            ).fetchall()
+        if not rows:
+            return None
+        grouped: Dict[str, List[int]] = {}
+        for hch_id, child_code in rows:
+            grouped.setdefault(hch_id, []).append(int(child_code))
+        return [
+            {"ORPHAcode": int(orpha_code), "hchId": int(hch_id) if hch_id.isdigit() else hch_id, "childs": childs}
+            for hch_id, childs in grouped.items()
+        ]
+
+    # Lokale Lookups dauern Mikrosekunden – die async-Varianten blockieren den Loop nicht spürbar
+    async def across_reference_by_name(self, name: str, lang_code: str = "EN") -> Optional[Any]:
+        return self.cross_reference_by_name(name, lang_code)
+
+    async def across_reference(self, orpha_code: str, lang_code: str = "EN") -> Optional[Any]:
+        return self.cross_reference(orpha_code, lang_code)
+
+    async def aphenotypes(self, orpha_code: str, lang_code: str = "EN") -> Optional[Any]:
+        return self.phenotypes(orpha_code, lang_code)
+
+    async def ahchids(self, orpha_code: str, lang_code: str = "EN") -> Optional[Any]:
+        return self.hchids(orpha_code, lang_code)
+
+    def find_code(self, name: str, lang_code: str = "EN") -> Optional[str]:
+        """Exakter (normalisierter) Namens-Treffer, sonst bester Volltext-Treffer."""
+        norm = normalize_name(name)
+        lang = lang_code.upper()
+        with self._lock:
+            for sql, params in (
+                ("SELECT orpha_code FROM names WHERE name_norm = ? AND lang = ? "
+                 "ORDER BY is_preferred DESC LIMIT 1", (norm, lang)),
+                ("SELECT orpha_code FROM names WHERE name_norm = ? "
+                 "ORDER BY is_preferred DESC LIMIT 1", (norm,)),
+            ):
+                row = self._conn.execute(sql, params).fetchone()
+                if row:
+                    return row[0]
+
+            tokens = re.findall(r"\w+", norm)
+            if not tokens:
+                return None
+            match = " ".join(f'"{t}"' for t in tokens)
+            row = self._conn.execute(
+                "SELECT orpha_code FROM names_fts WHERE names_fts MATCH ? "
+                "ORDER BY (lang = ?) DESC, bm25(names_fts) LIMIT 1",
+                (match, lang)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _first_lang(self, sql: str, orpha_code: str, lang_code: str) -> Optional[Tuple]:
+        with self._lock:
+            for lang in dict.fromkeys((lang_code.upper(), self._fallback_lang)):
+                row = self._conn.execute(sql, (orpha_code, lang)).fetchone()
+                if row:
+                    return row
+        return None
+
+
+# -------------------------------------------------------------------------------
+# Import der Produktdateien
+# -------------------------------------------------------------------------------
+def _text(elem: Optional[ET.Element], path: str, default: str = "") -> str:
+    found = elem.find(path) if elem is not None else None
+    return (found.text or "").strip() if found is not None and found.text else default
+
+
+def _iter_elements(path: str, tag: str) -> Iterator[ET.Element]:
+    """Streamt alle Elemente `tag` der obersten Ebene und gibt danach den Speicher frei."""
+    depth = 0
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        if elem.tag != tag:
+            continue
+        if event == "start":
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 0:
+            yield elem
+            elem.clear()
+
+
+def _lang_from_filename(path: str) -> str:
+    return os.path.basename(path).split("_", 1)[0].upper()
+
+
+def _definition(disorder: ET.Element) -> str:
+    for section in disorder.iter("TextSection"):
+        if _text(section, "TextSectionType/Name") == "Definition":
+            return _text(section, "Contents")
+    return ""
+
+
+def import_nomenclature(conn: sqlite3.Connection, path: str) -> int:
+    lang = _lang_from_filename(path)
+    count = 0
+    for disorder in _iter_elements(path, "Disorder"):
+        code = _text(disorder, "OrphaCode")
+        if not code:
+            continue
+        preferred = _text(disorder, "Name")
+        synonyms = [s.text.strip() for s in disorder.iter("Synonym") if s.text]
+        definition = _definition(disorder)
+        references = [
+            {
+                "Source": _text(ref, "Source"),
+                "Reference": _text(ref, "Reference"),
+                "DisorderMappingRelation": _text(ref, "DisorderMappingRelation/Name"),
+            }
+            for ref in disorder.iter("ExternalReference")
+        ]
+        record = {
+            "ORPHAcode": int(code),
+            "Preferred term": preferred,
+            "Synonym": synonyms,
+            "OrphanetURL": _text(disorder, "ExpertLink")
+            or f"http://www.orpha.net/consor/cgi-bin/OC_Exp.php?lng={lang}&Expert={code}",
+            "DisorderType": _text(disorder, "DisorderType/Name"),
+            "Typology": _text(disorder, "DisorderGroup/Name"),
+            "ExternalReference": references,
+            "SummaryInformation": [{"LangCode": lang.lower(), "Definition": definition}] if definition else [],
+        }
+        conn.execute(
+            "INSERT OR REPLACE INTO disorders (orpha_code, lang, preferred_term, record) VALUES (?, ?, ?, ?)",
+            (code, lang, preferred, json.dumps(record, ensure_ascii=False))
+        )
+        conn.execute("DELETE FROM names WHERE orpha_code = ? AND lang = ?", (code, lang))
+        conn.execute("DELETE FROM names_fts WHERE orpha_code = ? AND lang = ?", (code, lang))
+        for term, is_preferred in [(preferred, 1)] + [(s, 0) for s in synonyms]:
+            if not term:
+                continue
+            conn.execute(
+                "INSERT INTO names (name_norm, lang, orpha_code, is_preferred) VALUES (?, ?, ?, ?)",
+                (normalize_name(term), lang, code, is_preferred)
+            )
+            conn.execute(
+                "INSERT INTO names_fts (name, orpha_code, lang) VALUES (?, ?, ?)", (term, code, lang)
+            )
+        count += 1
+    return count
+
+
+def import_phenotypes(conn: sqlite3.Connection, path: str) -> int:
+    lang = _lang_from_filename(path)
+    count = 0
+    for status in _iter_elements(path, "HPODisorderSetStatus"):
+        disorder = status.find("Disorder")
+        code = _text(disorder, "OrphaCode")
+        if not code:
+            continue
+        associations = [
+            {
+                "HPO": {"HPOId": _text(assoc, "HPO/HPOId"), "HPOTerm": _text(assoc, "HPO/HPOTerm")},
+                "HPOFrequency": _text(assoc, "HPOFrequency/Name"),
+                "DiagnosticCriteria": _text(assoc, "DiagnosticCriteria/Name") or None,
+            }
+            for assoc in disorder.iter("HPODisorderAssociation")
+        ]
+        payload = {
+            "Disorder": {
+                "ORPHAcode": int(code),
+                "Preferred term": _text(disorder, "Name"),
+                "HPODisorderAssociation": associations,
+            }
+        }
+        conn.execute(
+            "INSERT OR REPLACE INTO phenotypes (orpha_code, lang, payload) VALUES (?, ?, ?)",
+            (code, lang, json.dumps(payload, ensure_ascii=False))
+        )
+        count += 1
+    return count
+
+
+def import_classification(conn: sqlite3.Connection, path: str) -> int:
+    count = 0
+    for classification in _iter_elements(path, "Classification"):
+        hch_id = classification.get("id") or _text(classification, "OrphaNumber")
+        stack = classification.findall("ClassificationNodeRootList/ClassificationNode")
+        while stack:
+            node = stack.pop()
+            code = _text(node, "Disorder/OrphaCode")
+            children = node.findall("ClassificationNodeChildList/ClassificationNode")
+            for position, child in enumerate(children):
+                child_code = _text(child, "Disorder/OrphaCode")
+                if code and child_code:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO classification (parent_code, child_code, hch_id, position) "
+                        "VALUES (?, ?, ?, ?)",
+                        (code, child_code, hch_id, position)
+                    )
+                    count += 1
+                stack.append(child)
+    return count
+
+
+def import_products(source_dir: str, db_path: str = DEFAULT_MIRROR_PATH) -> Dict[str, int]:
+    """Importiert alle gefundenen Produktdateien aus `source_dir` in `db_path`."""
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+
+    counts = {"disorders": 0, "phenotypes": 0, "classification": 0, "names": 0}
+    with conn:
+        for path in sorted(glob.glob(os.path.join(source_dir, "*_product1.xml"))):
+            counts["disorders"] += import_nomenclature(conn, path)
+        for path in sorted(glob.glob(os.path.join(source_dir, "*_product4.xml"))):
+            counts["phenotypes"] += import_phenotypes(conn, path)
+        for path in sorted(glob.glob(os.path.join(source_dir, "*_product3_*.xml"))):
+            counts["classification"] += import_classification(conn, path)
+        # Namensindex für den lokalen Namens-Resolver (disease_resolver.py)
+        from disease_resolver import build_name_index
+        counts["names"] = build_name_index(conn)
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('imported_at', ?)",
+            (time.strftime("%Y-%m-%dT%H:%M:%S"),)
+        )
+    conn.execute("ANALYZE")
+    conn.close()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Orphadata-Produktdateien in den lokalen Spiegel importieren")
+    parser.add_argument("source_dir", help="Verzeichnis mit *_product1.xml, *_product4.xml, *_product3_*.xml")
+    parser.add_argument("--db", default=DEFAULT_MIRROR_PATH, help="Zieldatei der SQLite-Datenbank")
+    args = parser.parse_args()
+
+    started = time.time()
+    result = import_products(args.source_dir, args.db)
+    print(f"Import nach '{args.db}' in {time.time() - started:.1f}s: {result}")
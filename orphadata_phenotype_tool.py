@@ -1,9 +1,12 @@
 # orphadata_phenotype_tool.py
 
-import requests
+import asyncio
 from typing import List, Dict, Any
 from pydantic import PrivateAttr
 from langchain.tools import BaseTool
+from response_cache import ResponseCache
+from http_client import HttpClient
+from orphadata_backend import OrphadataUnavailable, get_orphadata_backend
 
 class OrphadataPhenotypeTool(BaseTool):
     name: str = "orphadata_phenotype_tool"
@@ -11,31 +14,47 @@ class OrphadataPhenotypeTool(BaseTool):
         "Lädt die HPO-Phänotypen zu einer seltenen Erkrankung via ORPHAcode."
     )
     _base_url: str = PrivateAttr()
+    _backend: Any = PrivateAttr()
+    _timeout: float = PrivateAttr()
 
-    def __init__(self, base_url: str = "https://api.orphadata.com"):
+    def __init__(
+        self,
+        base_url: str = "https://api.orphadata.com",
+        cache: ResponseCache = None,
+        http_client: HttpClient = None,
+        backend: Any = None,
+        timeout: float = 15.0
+    ):
         super().__init__()
         self._base_url = base_url.rstrip("/")
+        self._backend = backend or get_orphadata_backend(self._base_url, http_client=http_client, cache=cache)
+        self._timeout = timeout
 
     def _run(self, orpha_code: str, lang_code: str = "EN") -> List[Dict[str, Any]]:
         return self.get_phenotypes(orpha_code, lang_code)
 
     async def _arun(self, orpha_code: str, lang_code: str = "EN") -> List[Dict[str, Any]]:
-        return self.get_phenotypes(orpha_code, lang_code)
+        return await self.aget_phenotypes(orpha_code, lang_code)
 
     def get_phenotypes(self, orpha_code: str, lang_code: str = "EN") -> List[Dict[str, Any]]:
-        endpoint = f"{self._base_url}/rd-phenotypes/orphacodes/{orpha_code}"
-        resp = requests.get(
-            endpoint,
-            params={"language": lang_code},
-            headers={"Accept": "application/json"},
-            timeout=5
-        )
-        if resp.status_code != 200:
+        try:
+            payload = self._backend.phenotypes(orpha_code, lang_code)
+        except OrphadataUnavailable:
             return []
+        return self._parse_phenotypes(payload)
 
+    async def aget_phenotypes(self, orpha_code: str, lang_code: str = "EN") -> List[Dict[str, Any]]:
         try:
-            payload = resp.json().get("data", {}).get("results", {})
-        except ValueError:
+            payload = await asyncio.wait_for(
+                self._backend.aphenotypes(orpha_code, lang_code), timeout=self._timeout
+            )
+        except (OrphadataUnavailable, asyncio.TimeoutError):
+            return []
+        return self._parse_phenotypes(payload)
+
+    @staticmethod
+    def _parse_phenotypes(payload: Any) -> List[Dict[str, Any]]:
+        if not payload:
             return []
 
         # hier nehmen wir den korrekten Pfad
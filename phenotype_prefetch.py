@@ -0,0 +1,123 @@
+# phenotype_prefetch.py
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from translation import translate_batch
+
+
+class PhenotypeData(NamedTuple):
+    """Alles, was der "Mehr Infos"-Button zum Rendern braucht."""
+    phenotypes: List[Dict[str, Any]]
+    names: Dict[str, str]              # HPOId → Name in Nutzersprache
+    subtypes: Optional[Dict[str, str]]  # nur wenn keine Phänotypen vorhanden sind (und with_subtypes)
+
+
+class PhenotypePrefetcher:
+    """
+    Lädt Phänotypen (inkl. übersetzter Namen) bzw. die Subtypen-Liste im Hintergrund,
+    sobald ein ORPHAcode bekannt ist. Ergebnisse liegen pro (Code, Sprache) in einem
+    begrenzten Cache; `get` liefert sie sofort oder wartet auf den laufenden Abruf.
+    Läuft in Worker-Threads – darf daher nicht auf st.session_state zugreifen.
+    Mit `with_subtypes=False` bleibt die Subtypen-Auflösung dem Aufrufer überlassen
+    (der Rare-Disease-Graph holt die Klassifikation in einem eigenen Zweig).
+    """
+
+    def __init__(
+        self,
+        phenotype_tool: Any,
+        subtype_resolver: Any,
+        translate: Callable[[List[str], str], List[str]] = translate_batch,
+        hpo_labels: Any = None,
+        max_workers: int = 4,
+        max_entries: int = 256,
+        with_subtypes: bool = True
+    ):
+        self._phenotype_tool = phenotype_tool
+        self._subtype_resolver = subtype_resolver
+        self._translate = translate
+        self._hpo_labels = hpo_labels
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._max_entries = max_entries
+        self._with_subtypes = with_subtypes
+        self._futures: "OrderedDict[Tuple[str, str], Future]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"prefetched": 0, "hits": 0, "waits": 0, "misses": 0, "errors": 0,
+                       "labels_local": 0, "labels_translated": 0}
+
+    def prefetch(self, orpha_code: str, lang_code: str) -> None:
+        """Startet den Abruf im Hintergrund (no-op, wenn schon vorhanden/unterwegs)."""
+        key = (str(orpha_code), lang_code.upper())
+        with self._lock:
+            if key in self._futures:
+                return
+            self._futures[key] = self._pool.submit(self._load, *key)
+            self._stats["prefetched"] += 1
+            self._evict()
+
+    def get(self, orpha_code: str, lang_code: str, timeout: Optional[float] = None) -> PhenotypeData:
+        """Fertiges Ergebnis (Hit), laufenden Abruf abwarten (Wait) oder direkt laden (Miss)."""
+        key = (str(orpha_code), lang_code.upper())
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                self._futures.move_to_end(key)
+                self._stats["hits" if future.done() else "waits"] += 1
+            else:
+                self._stats["misses"] += 1
+
+        if future is not None:
+            try:
+                return future.result(timeout=timeout)
+            except Exception as e:
+                print("Prefetch fehlgeschlagen:", e)
+                with self._lock:
+                    self._stats["errors"] += 1
+                    if self._futures.get(key) is future:
+                        del self._futures[key]
+
+        data = self._load(*key)
+        with self._lock:
+            done: Future = Future()
+            done.set_result(data)
+            self._futures[key] = done
+            self._evict()
+        return data
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._futures)
+        lookups = stats["hits"] + stats["waits"] + stats["misses"]
+        # Hit-Rate: Anteil der Klicks, die nicht kalt geladen werden mussten
+        stats["hit_rate"] = (stats["hits"] + stats["waits"]) / lookups if lookups else 0.0
+        return stats
+
+    def _load(self, orpha_code: str, lang_code: str) -> PhenotypeData:
+        phenotypes = self._phenotype_tool.get_phenotypes(orpha_code, lang_code=lang_code)
+        if not phenotypes:
+            if not self._with_subtypes:
+                return PhenotypeData([], {}, None)
+            subtypes = self._subtype_resolver.resolve(orpha_code, lang_code=lang_code)
+            return PhenotypeData([], {}, subtypes)
+
+        names = {p["HPOId"]: p["Name"] for p in phenotypes}
+        if lang_code != "EN":
+            # Zuerst das lokale HPO-Wörterbuch, nur fehlende Bezeichnungen gehen ans LLM
+            local = self._hpo_labels.lookup(names, lang_code) if self._hpo_labels else {}
+            missing = [i for i in names if i not in local]
+            if missing:
+                translated = self._translate([names[i] for i in missing], lang_code)
+                local.update(zip(missing, translated))
+            with self._lock:
+                self._stats["labels_local"] += len(names) - len(missing)
+                self._stats["labels_translated"] += len(missing)
+            names = {i: local[i] for i in names}
+        return PhenotypeData(phenotypes, names, None)
+
+    def _evict(self) -> None:
+        # Älteste Einträge verwerfen (Aufruf nur mit gehaltenem Lock)
+        while len(self._futures) > self._max_entries:
+            self._futures.popitem(last=False)
@@ -0,0 +1,129 @@
+# resources.py
+#
+# Prozessweite Registry für alles, was sich Streamlit-Sessions teilen können: Tools,
+# Vektor-Store, kompilierter Graph, Prefetcher. Jede Ressource wird beim ersten Zugriff
+# genau einmal erzeugt (auch wenn mehrere Sessions gleichzeitig starten); eine neue
+# Session kostet danach nur noch ihren eigenen Gesprächszustand.
+
+import sys
+import threading
+import time
+import types
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Set
+
+
+def rss_bytes() -> int:
+    """
+    Aktueller Resident Set Size (Linux), sonst Spitzenwert aus getrusage (POSIX);
+    0, wenn beides fehlt (Windows).
+    """
+    try:
+        import resource  # nur POSIX
+    except ImportError:
+        return 0
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# Typen, deren Inhalt nicht zum Session-Zustand gehört (Code, Module, Klassen)
+_SKIP_TYPES = (types.ModuleType, type, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def deep_sizeof(obj: Any, exclude: Optional[Set[int]] = None) -> int:
+    """
+    Grobe Größe eines Objektgraphen in Bytes (sys.getsizeof über Container und __dict__).
+    Objekte in `exclude` (IDs geteilter Ressourcen) und alles dahinter zählen nicht mit.
+    """
+    seen = set(exclude or ())
+    stack = [obj]
+    total = 0
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _SKIP_TYPES):
+            continue
+        seen.add(id(current))
+        try:
+            total += sys.getsizeof(current)
+        except TypeError:
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif hasattr(current, "__dict__"):
+            stack.append(vars(current))
+    return total
+
+
+class ResourceRegistry:
+    """
+    Thread-sichere, lazy erzeugte Singletons nach Namen. Der Aufbau einer Ressource hält
+    nur ihren eigenen Lock – ein langsamer FaqTool-Start blockiert also nicht den Graph.
+    Pro Ressource werden Aufbauzeit und RSS-Zuwachs festgehalten (bei gleichzeitigem
+    Aufbau mehrerer Ressourcen nur näherungsweise).
+    """
+
+    def __init__(self):
+        self._resources: Dict[str, Any] = {}
+        self._info: Dict[str, Dict[str, float]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, factory: Callable[[], Any]) -> Any:
+        instance = self._resources.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            name_lock = self._locks.setdefault(name, threading.Lock())
+        with name_lock:
+            instance = self._resources.get(name)
+            if instance is None:
+                before, started = rss_bytes(), time.monotonic()
+                instance = factory()
+                info = {
+                    "init_seconds": round(time.monotonic() - started, 3),
+                    "rss_delta_mb": round((rss_bytes() - before) / 2 ** 20, 1),
+                }
+                with self._lock:
+                    self._info[name] = info
+                    self._resources[name] = instance
+        return instance
+
+    def shared_ids(self) -> Set[int]:
+        with self._lock:
+            return {id(r) for r in self._resources.values()}
+
+    def session_footprint(self, state: Mapping[str, Any], skip: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        Speicher, den eine Session zusätzlich zu den geteilten Ressourcen belegt, pro Schlüssel
+        ihres Zustands (z. B. st.session_state.to_dict()) und gesamt, in Bytes.
+        """
+        exclude = self.shared_ids()
+        skip = set(skip)
+        per_key = {key: deep_sizeof(value, exclude) for key, value in state.items() if key not in skip}
+        return {"total_bytes": sum(per_key.values()), "keys": per_key}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "resources": {name: dict(info) for name, info in self._info.items()},
+                "rss_mb": round(rss_bytes() / 2 ** 20, 1),
+            }
+
+
+_registry: Optional[ResourceRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ResourceRegistry:
+    """Prozessweite Registry (alle Streamlit-Sessions laufen im selben Prozess)."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ResourceRegistry()
+        return _registry
+
@@ -0,0 +1,185 @@
+# response_cache.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Sentinel für "nicht im Cache" (None steht für einen negativ gecachten 404)
+CACHE_MISS = object()
+
+
+class ResponseCache:
+    """
+    Zweistufiger Antwort-Cache: LRU im Speicher vor einer SQLite-Datei auf Platte.
+    Schlüssel = Endpoint + ORPHAcode/Name + Sprache. Einträge laufen nach `ttl`
+    Sekunden ab, 404-Antworten werden mit `negative_ttl` negativ gecacht.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = "./cache/orphadata_cache.sqlite",
+        max_entries: int = 1024,
+        max_disk_entries: int = 50000,
+        ttl: float = 30 * 24 * 3600,
+        negative_ttl: float = 24 * 3600,
+    ):
+        self._max_entries = max_entries
+        self._max_disk_entries = max_disk_entries
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._memory: "OrderedDict[str, Tuple[Any, bool, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "negative_hits": 0,
+            "disk_hits": 0,
+            "evictions": 0,
+            "disk_evictions": 0,
+        }
+
+        # SQLite-Tier ist optional (db_path=None → nur Speicher)
+        self._conn: Optional[sqlite3.Connection] = None
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " payload TEXT,"
+                " negative INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(endpoint: str, ident: str, language: str) -> str:
+        return f"{endpoint}|{str(ident).strip()}|{(language or '').upper()}"
+
+    def get(self, endpoint: str, ident: str, language: str) -> Any:
+        """
+        Liefert die gecachte Payload, None für einen negativ gecachten Eintrag
+        oder CACHE_MISS, wenn nichts (Gültiges) vorhanden ist.
+        """
+        key = self.make_key(endpoint, ident, language)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                payload, negative, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    return self._count_hit(payload, negative)
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT payload, negative, expires_at FROM responses WHERE key = ?",
+                    (key,)
+                ).fetchone()
+                if row is not None:
+                    raw, negative, expires_at = row
+                    if expires_at > now:
+                        payload = json.loads(raw) if raw is not None else None
+                        self._conn.execute(
+                            "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+                        )
+                        self._conn.commit()
+                        self._remember(key, payload, bool(negative), expires_at)
+                        self._stats["disk_hits"] += 1
+                        return self._count_hit(payload, bool(negative))
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+
+            self._stats["misses"] += 1
+            return CACHE_MISS
+
+    def put(self, endpoint: str, ident: str, language: str, payload: Any) -> None:
+        self._store(self.make_key(endpoint, ident, language), payload, False, self._ttl)
+
+    def put_not_found(self, endpoint: str, ident: str, language: str) -> None:
+        """Negatives Caching (z. B. 404), damit Fehlanfragen nicht erneut rausgehen."""
+        self._store(self.make_key(endpoint, ident, language), None, True, self._negative_ttl)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM responses")
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    # --- Interne Helfer (Aufruf nur mit gehaltenem Lock) ---
+    def _count_hit(self, payload: Any, negative: bool) -> Any:
+        self._stats["hits"] += 1
+        if negative:
+            self._stats["negative_hits"] += 1
+            return None
+        return payload
+
+    def _remember(self, key: str, payload: Any, negative: bool, expires_at: float) -> None:
+        self._memory[key] = (payload, negative, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _store(self, key: str, payload: Any, negative: bool, ttl: float) -> None:
+        now = time.time()
+        expires_at = now + ttl
+        with self._lock:
+            self._remember(key, payload, negative, expires_at)
+            if self._conn is None:
+                return
+            raw = json.dumps(payload, ensure_ascii=False) if payload is not None else None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, payload, negative, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, raw, int(negative), expires_at, now)
+            )
+            # Platten-Tier begrenzen: älteste (zuletzt nicht genutzte) Einträge verwerfen
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            overflow = count - self._max_disk_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                    (overflow,)
+                )
+                self._stats["disk_evictions"] += overflow
+            self._conn.commit()
+
+
+_default_cache: Optional[ResponseCache] = None
+_default_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Prozessweiter Standard-Cache, konfigurierbar über Umgebungsvariablen."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache(
+                db_path=os.getenv("ORPHADATA_CACHE_PATH", "./cache/orphadata_cache.sqlite") or None,
+                max_entries=int(os.getenv("ORPHADATA_CACHE_MAX_ENTRIES", "1024")),
+                ttl=float(os.getenv("ORPHADATA_CACHE_TTL", str(30 * 24 * 3600))),
+                negative_ttl=float(os.getenv("ORPHADATA_CACHE_NEGATIVE_TTL", str(24 * 3600))),
+            )
+        return _default_cache
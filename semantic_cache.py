@@ -0,0 +1,174 @@
+# semantic_cache.py
+#
+# Semantischer Antwort-Cache für den Service-Modus: Paraphrasen bereits beantworteter
+# FAQ-Fragen bekommen die gespeicherte Antwort, ohne RetrievalQA-Generierung.
+
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Ähnlichkeits-Histogramm für die Schwellwert-Abstimmung: ein Bucket unter 0.5, darüber à 0.05
+_BUCKETS = [round(0.5 + 0.05 * i, 2) for i in range(10)]
+_BUCKET_LABELS = ["<0.5"] + [f">={b}" for b in _BUCKETS]
+
+
+class _Partition:
+    """Ringpuffer normalisierter Frage-Vektoren (float32) einer Sprache/Kategorie/k."""
+
+    def __init__(self, dim: int, capacity: int):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.answers: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self.size = 0
+        self.next = 0
+
+    def best(self, query: np.ndarray) -> Tuple[float, Optional[Dict[str, Any]]]:
+        if self.size == 0:
+            return 0.0, None
+        scores = self.vectors[:self.size] @ query
+        i = int(np.argmax(scores))
+        return float(scores[i]), self.answers[i]
+
+    def add(self, vector: np.ndarray, answer: Dict[str, Any]) -> None:
+        # Voll → ältesten Eintrag überschreiben
+        self.vectors[self.next] = vector
+        self.answers[self.next] = answer
+        self.next = (self.next + 1) % len(self.answers)
+        self.size = min(self.size + 1, len(self.answers))
+
+
+class SemanticAnswerCache:
+    """
+    Liefert eine gespeicherte Antwort, wenn die Kosinus-Ähnlichkeit der neuen Frage
+    zu einer bereits beantworteten Frage derselben Sprache/Kategorie den Schwellwert
+    erreicht. Schwellwerte lassen sich pro "sprache/kategorie" oder "sprache"
+    überschreiben. Ändert sich die `ingest_id` der FAQ-Collection, wird alles verworfen.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        thresholds: Optional[Dict[str, float]] = None,
+        max_entries: int = 512
+    ):
+        self._threshold = threshold
+        self._thresholds = dict(thresholds or {})
+        self._max_entries = max_entries
+        self._partitions: Dict[Tuple[str, str, int], _Partition] = {}
+        self._ingest_id: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+        self._histogram = {"hits": [0] * len(_BUCKET_LABELS), "misses": [0] * len(_BUCKET_LABELS)}
+
+    def threshold_for(self, language: Optional[str], category: Optional[str]) -> float:
+        lang = (language or "").lower()
+        return self._thresholds.get(
+            f"{lang}/{(category or '').lower()}", self._thresholds.get(lang, self._threshold)
+        )
+
+    def lookup(
+        self,
+        vector: List[float],
+        language: Optional[str],
+        category: Optional[str],
+        k: int,
+        ingest_id: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        query = self._normalize(vector)
+        with self._lock:
+            self._check_ingest(ingest_id)
+            partition = self._partitions.get(self._key(language, category, k))
+            score, answer = partition.best(query) if partition else (0.0, None)
+            hit = answer is not None and score >= self.threshold_for(language, category)
+            self._stats["hits" if hit else "misses"] += 1
+            if answer is not None:
+                self._histogram["hits" if hit else "misses"][self._bucket(score)] += 1
+        return answer if hit else None
+
+    def store(
+        self,
+        vector: List[float],
+        language: Optional[str],
+        category: Optional[str],
+        k: int,
+        ingest_id: Optional[str],
+        answer: Dict[str, Any]
+    ) -> None:
+        query = self._normalize(vector)
+        with self._lock:
+            self._check_ingest(ingest_id)
+            key = self._key(language, category, k)
+            partition = self._partitions.get(key)
+            if partition is None or partition.vectors.shape[1] != len(query):
+                partition = self._partitions[key] = _Partition(len(query), self._max_entries)
+            partition.add(query, answer)
+            self._stats["stores"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._partitions.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = sum(p.size for p in self._partitions.values())
+            # Verteilung der besten Ähnlichkeit je Lookup, getrennt nach Hit/Miss
+            stats["similarity"] = {
+                kind: {label: n for label, n in zip(_BUCKET_LABELS, counts) if n}
+                for kind, counts in self._histogram.items()
+            }
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    # --- Interne Helfer ---
+    @staticmethod
+    def _key(language: Optional[str], category: Optional[str], k: int) -> Tuple[str, str, int]:
+        return (language or "").lower(), category or "", k
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    @staticmethod
+    def _bucket(score: float) -> int:
+        # 0 = unter 0.5; Rundung gegen Float-Fehler an den Bucket-Grenzen (0.55 → ">=0.55")
+        if score < _BUCKETS[0]:
+            return 0
+        return 1 + min(len(_BUCKETS) - 1, int(round((score - 0.5) / 0.05, 9)))
+
+    def _check_ingest(self, ingest_id: Optional[str]) -> None:
+        # Aufruf nur mit gehaltenem Lock
+        if ingest_id != self._ingest_id:
+            if self._partitions:
+                self._stats["invalidations"] += 1
+            self._partitions.clear()
+            self._ingest_id = ingest_id
+
+
+_cache: Optional[SemanticAnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """
+    Prozessweiter Antwort-Cache. FAQ_CACHE_THRESHOLD setzt den Standard-Schwellwert,
+    FAQ_CACHE_THRESHOLDS Ausnahmen, z. B. "de=0.93,en/medication=0.97".
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            thresholds = {}
+            for item in os.getenv("FAQ_CACHE_THRESHOLDS", "").split(","):
+                if "=" in item:
+                    key, value = item.split("=", 1)
+                    thresholds[key.strip().lower()] = float(value)
+            _cache = SemanticAnswerCache(
+                threshold=float(os.getenv("FAQ_CACHE_THRESHOLD", "0.95")),
+                thresholds=thresholds,
+                max_entries=int(os.getenv("FAQ_CACHE_MAX_ENTRIES", "512")),
+            )
+        return _cache
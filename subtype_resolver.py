@@ -0,0 +1,80 @@
+# subtype_resolver.py
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from http_client import HttpClient
+from orphadata_backend import OrphadataUnavailable, get_orphadata_backend
+from translation import translate_batch
+
+
+class SubtypeResolver:
+    """
+    Ermittelt die Subtypen (Klassifikations-Kinder) eines ORPHAcodes samt Namen.
+    Die Cross-Reference-Abfragen laufen parallel in einem langlebigen Pool der Instanz
+    (`max_workers` Threads, geteilt über alle Aufrufe – die Instanz selbst ist prozessweit
+    geteilt, siehe agent.shared_subtype_resolver); die Namen werden anschließend in einem
+    einzigen Request übersetzt.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "https://api.orphadata.com",
+        http_client: HttpClient = None,
+        backend: Any = None,
+        max_workers: int = 8,
+        translate: Callable[[List[str], str], List[str]] = translate_batch
+    ):
+        self._backend = backend or get_orphadata_backend(base_url, http_client=http_client)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="subtypes")
+        self._translate = translate
+
+    def resolve(self, orpha_code: str, lang_code: str = "EN") -> Dict[str, str]:
+        """
+        Liefert {Anzeigename: Subtyp-Code} in stabiler Reihenfolge (wie von Orphadata geliefert).
+        Leeres Dict, wenn keine Subtypen gefunden wurden.
+        """
+        child_codes = self.child_codes(orpha_code, lang_code)
+        if not child_codes:
+            return {}
+
+        # Cross-Reference parallel abfragen; map() erhält die Reihenfolge
+        names_en = list(self._pool.map(lambda c: self.subtype_name(c, lang_code), child_codes))
+
+        names = names_en
+        if lang_code.upper() != "EN":
+            names = self._translate(names_en, lang_code.upper())
+
+        subtype_map: Dict[str, str] = {}
+        for name, sub_code in zip(names, child_codes):
+            # Gleichlautende Übersetzungen nicht gegenseitig überschreiben
+            key = name if name not in subtype_map else f"{name} ({sub_code})"
+            subtype_map[key] = sub_code
+        return subtype_map
+
+    def child_codes(self, orpha_code: str, lang_code: str = "EN") -> List[str]:
+        try:
+            hch_list = self._backend.hchids(orpha_code, lang_code) or []
+        except OrphadataUnavailable as e:
+            print("Orphadata-Fehler bei hchids:", e)
+            return []
+
+        # Alle 'childs'-Codes sammeln (ohne Duplikate, Reihenfolge bleibt erhalten)
+        codes: Dict[str, None] = {}
+        for h in hch_list:
+            for c in h.get("childs", []):
+                codes[str(c)] = None
+        return list(codes)
+
+    def subtype_name(self, sub_code: str, lang_code: str = "EN") -> str:
+        try:
+            cr = self._backend.cross_reference(sub_code, lang_code) or {}
+        except OrphadataUnavailable as e:
+            print("Orphadata-Fehler bei Cross-Reference:", e)
+            cr = {}
+        return (
+            cr.get("Name")
+            or cr.get("preferredTerm")
+            or cr.get("Preferred term")
+            or str(sub_code)
+        )
@@ -0,0 +1,262 @@
+# translation.py
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+from llm_gateway import get_llm_gateway
+from response_cache import ResponseCache, CACHE_MISS
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.encoding_for_model("gpt-3.5-turbo")
+except Exception:
+    _ENCODING = None
+
+LANGUAGE_NAMES = {
+    "DE": "Deutsch",
+    "PL": "Polnisch",
+    "ES": "Spanisch",
+    "PT": "Portugiesisch",
+    "EN": "Englisch"
+}
+
+# Timeout pro OpenAI-Request (Sekunden)
+REQUEST_TIMEOUT = 30.0
+
+MODEL = "gpt-3.5-turbo"
+
+# Bei jeder inhaltlichen Prompt-Änderung hochzählen – alte Cache-Einträge gelten dann nicht mehr
+PROMPT_VERSIONS = {"text": 1, "batch": 1}
+
+# Batch-Übersetzung: Token-Budget und Maximalgröße pro Request, Wiederholungen für Fehlschläge
+BATCH_TOKEN_BUDGET = 1500
+BATCH_MAX_ITEMS = 60
+BATCH_RETRIES = 2
+
+
+def _text_prompt(text: str, target_lang: str) -> str:
+    language_name = LANGUAGE_NAMES.get(target_lang, "Englisch")
+    return f"Übersetze den folgenden Text ins {language_name}:\n\n{text}"
+
+
+def _batch_prompt(items: Dict[int, str], target_lang: str) -> str:
+    lang_name = LANGUAGE_NAMES.get(target_lang, "Englisch")
+    payload = {"items": [{"id": i, "text": t} for i, t in items.items()]}
+    return (
+        f"Übersetze den Text jedes Eintrags ins {lang_name}, jeweils nur den Ausdruck selbst, "
+        f"ohne Erklärungen. Antworte ausschließlich mit JSON der Form "
+        f'{{"translations": [{{"id": <id>, "text": "<Übersetzung>"}}]}} '
+        f"mit genau einem Eintrag pro id:\n\n"
+        f"{json.dumps(payload, ensure_ascii=False)}"
+    )
+
+
+def _parse_batch(content: str, items: Dict[int, str]) -> Dict[int, str]:
+    """Gültige Übersetzungen je id; fehlende, doppelte oder leere Einträge fehlen im Ergebnis."""
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return {}
+    entries = data.get("translations", []) if isinstance(data, dict) else []
+    seen: Dict[int, str] = {}
+    duplicates = set()
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            item_id = int(entry.get("id"))
+        except (TypeError, ValueError):
+            continue
+        text = str(entry.get("text") or "").strip()
+        if item_id not in items or not text:
+            continue
+        if item_id in seen:
+            duplicates.add(item_id)
+        seen[item_id] = text
+    return {i: t for i, t in seen.items() if i not in duplicates}
+
+
+def count_tokens(text: str) -> int:
+    """Tokenanzahl für gpt-3.5-turbo (tiktoken, sonst grobe Schätzung)."""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return len(text) // 3 + 1
+
+
+def _chunks(items: Dict[int, str], token_budget: int, max_items: int) -> List[Dict[int, str]]:
+    """Teilt die Einträge so auf, dass jeder Request im Token-Budget bleibt."""
+    chunks: List[Dict[int, str]] = []
+    current: Dict[int, str] = {}
+    used = 0
+    for item_id, text in items.items():
+        # Eingabe + Ausgabe (ähnlich lang) + JSON-Overhead pro Eintrag
+        cost = 2 * count_tokens(text) + 12
+        if current and (used + cost > token_budget or len(current) >= max_items):
+            chunks.append(current)
+            current, used = {}, 0
+        current[item_id] = text
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _complete(prompt: str, json_mode: bool = False) -> str:
+    return get_llm_gateway().complete(prompt, model=MODEL, json_mode=json_mode, timeout=REQUEST_TIMEOUT)
+
+
+# --- Übersetzungs-Memo: inhaltsadressiert (sha256 des Quelltexts, Zielsprache, Modell, Prompt-Version) ---
+_memo: Optional[ResponseCache] = None
+_memo_lock = threading.Lock()
+
+
+def get_translation_cache() -> ResponseCache:
+    """Prozessweiter Übersetzungs-Cache (LRU vor SQLite); Übersetzungen laufen praktisch nicht ab."""
+    global _memo
+    with _memo_lock:
+        if _memo is None:
+            _memo = ResponseCache(
+                db_path=os.getenv("TRANSLATION_CACHE_PATH", "./cache/translations.sqlite") or None,
+                max_entries=int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "4096")),
+                max_disk_entries=int(os.getenv("TRANSLATION_CACHE_MAX_DISK_ENTRIES", "200000")),
+                ttl=10 * 365 * 24 * 3600,
+            )
+        return _memo
+
+
+def _memo_endpoint(kind: str) -> str:
+    return f"translation/{kind}/{MODEL}/v{PROMPT_VERSIONS[kind]}"
+
+
+def _memo_get(kind: str, text: str, target_lang: str) -> Optional[str]:
+    cached = get_translation_cache().get(
+        _memo_endpoint(kind), hashlib.sha256(text.encode("utf-8")).hexdigest(), target_lang
+    )
+    return None if cached is CACHE_MISS else cached
+
+
+def _memo_put(kind: str, text: str, target_lang: str, translation: str) -> None:
+    get_translation_cache().put(
+        _memo_endpoint(kind), hashlib.sha256(text.encode("utf-8")).hexdigest(), target_lang, translation
+    )
+
+
+def seed_translation_cache(path: str) -> int:
+    """
+    Befüllt den Cache vorab aus einer JSONL-Datei, eine Übersetzung pro Zeile:
+    {"text": ..., "target_lang": "DE", "translation": ..., "kind": "text"|"batch"}
+    (kind optional, Standard "text").
+    """
+    count = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            _memo_put(entry.get("kind", "text"), entry["text"], entry["target_lang"], entry["translation"])
+            count += 1
+    return count
+
+
+# --- OpenAI 1.x-kompatible Übersetzungsfunktion ---
+def translate_with_openai(text: str, target_lang: str) -> str:
+    cached = _memo_get("text", text, target_lang)
+    if cached is not None:
+        return cached
+    try:
+        translation = _complete(_text_prompt(text, target_lang))
+        _memo_put("text", text, target_lang, translation)
+        return translation
+    except Exception as e:
+        print("OpenAI-Übersetzungsfehler:", e)
+        return text
+
+
+def translate_streaming(text: str, target_lang: str, config: Optional[RunnableConfig] = None) -> str:
+    """
+    Wie translate_with_openai (gleicher Prompt, gleiches Memo), aber über das LangChain-
+    Chatmodell des Gateways: mit den Callbacks aus `config` (z. B. in einem LangGraph-Node
+    mit stream_mode "messages") kommen die Tokens schon während der Generierung an.
+    """
+    cached = _memo_get("text", text, target_lang)
+    if cached is not None:
+        return cached
+    try:
+        message = get_llm_gateway().chat_model(temperature=0, model=MODEL).invoke(
+            _text_prompt(text, target_lang), config
+        )
+        translation = message.content
+        _memo_put("text", text, target_lang, translation)
+        return translation
+    except Exception as e:
+        print("OpenAI-Übersetzungsfehler:", e)
+        return text
+
+
+def translate_batch(
+    terms: List[str],
+    target_lang: str,
+    token_budget: int = BATCH_TOKEN_BUDGET,
+    max_items: int = BATCH_MAX_ITEMS,
+    retries: int = BATCH_RETRIES
+) -> List[str]:
+    """
+    Übersetzt eine Liste kurzer Ausdrücke (z. B. HPO-Namen) mit einem strukturierten
+    Request pro Chunk. Die Rückgabe ist positionsgleich zur Eingabe. Einträge, deren
+    Übersetzung fehlt oder nicht zuordenbar ist, werden in der nächsten Runde erneut
+    angefragt – nur diese, nicht der ganze Chunk; was danach noch fehlt, bleibt im Original.
+    """
+    unique = list(dict.fromkeys(t for t in terms if t and t.strip()))
+    done: Dict[int, str] = {}
+    for i, term in enumerate(unique):
+        cached = _memo_get("batch", term, target_lang)
+        if cached is not None:
+            done[i] = cached
+    pending = {i: t for i, t in enumerate(unique) if i not in done}
+    fresh = set(pending)
+
+    for _ in range(retries + 1):
+        if not pending:
+            break
+        for chunk in _chunks(pending, token_budget, max_items):
+            try:
+                done.update(_parse_batch(_complete(_batch_prompt(chunk, target_lang), json_mode=True), chunk))
+            except Exception as e:
+                print("Batch-Übersetzungsfehler:", e)
+        # Nur die fehlgeschlagenen Einträge gehen in die nächste Runde
+        pending = {i: t for i, t in pending.items() if i not in done}
+
+    for i in fresh & set(done):
+        _memo_put("batch", unique[i], target_lang, done[i])
+    mapping = {unique[i]: text for i, text in done.items()}
+    return [mapping.get(t, t) for t in terms]
+
+
+# --- Async-Variante für FaqTool._arun; CancelledError ist keine Exception und wird durchgereicht ---
+async def atranslate_streaming(text: str, target_lang: str, config: Optional[RunnableConfig] = None) -> str:
+    cached = _memo_get("text", text, target_lang)
+    if cached is not None:
+        return cached
+    try:
+        message = await get_llm_gateway().chat_model(temperature=0, model=MODEL).ainvoke(
+            _text_prompt(text, target_lang), config
+        )
+        translation = message.content
+        _memo_put("text", text, target_lang, translation)
+        return translation
+    except Exception as e:
+        print("OpenAI-Übersetzungsfehler:", e)
+        return text
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Übersetzungs-Cache vorbefüllen")
+    parser.add_argument("seed_file", help="JSONL mit text, target_lang, translation[, kind]")
+    args = parser.parse_args()
+    print(f"{seed_translation_cache(args.seed_file)} Übersetzungen in den Cache übernommen")
@@ -1,11 +1,13 @@
 # wikidata_tool.py
 
+import asyncio
 from pydantic import BaseModel, Field, PrivateAttr
-from typing import Type, Dict, Any, List
+from typing import Type, Dict, Any, List, Optional
 from langchain.tools import BaseTool
-import requests
+import httpx
 import urllib.parse
 import streamlit as st
+from http_client import HttpClient, get_http_client, get_async_http_client
 
 # Mapping von Session-Sprache zu Wikidata-Language-Code
 LANG_MAP = {
@@ -19,6 +21,9 @@ LANG_MAP = {
 class WikidataInput(BaseModel):
     name: str = Field(..., description="Krankheitsname (deutsch, englisch, polnisch, spanisch, portugiesisch)")
     info_type: str = Field("symptoms", description="Angefragte Info: 'symptoms', 'icd', 'related' usw.")
+    # Ohne Angabe gilt die Session-Sprache; Aufrufer außerhalb des Streamlit-Threads
+    # (z. B. parallele Graph-Zweige) müssen sie mitgeben
+    language: Optional[str] = Field(None, description="Sprachcode der Antwort (de, en, pl, es, pt)")
 
 class WikidataTool(BaseTool):
     name: str = "wikidata_tool"
@@ -30,36 +35,57 @@ class WikidataTool(BaseTool):
 
     _wikidata_url: str = PrivateAttr("https://www.wikidata.org/w/api.php")
     _sparql_url: str = PrivateAttr("https://query.wikidata.org/sparql")
+    _http: HttpClient = PrivateAttr()
+    _timeout: float = PrivateAttr()
 
-    def _run(self, name: str, info_type: str = "symptoms") -> str:
-        lang_code = LANG_MAP.get(st.session_state.lang, "en")
+    def __init__(self, http_client: HttpClient = None, timeout: float = 20.0):
+        super().__init__()
+        self._http = http_client or get_http_client()
+        # Gesamt-Timeout für _arun (Q-ID-Suche + SPARQL)
+        self._timeout = timeout
+
+    def _run(self, name: str, info_type: str = "symptoms", language: Optional[str] = None) -> str:
+        lang_code = LANG_MAP.get(language or st.session_state.lang, "en")
         qid = self._find_qid(name, lang_code)
         if not qid:
             return self._no_info_message(info_type, lang_code)
 
-        if info_type == "symptoms":
-            return self._fetch_symptoms(qid, lang_code)
-        elif info_type == "icd":
-            return self._fetch_icd(qid)
-        elif info_type == "related":
-            return self._fetch_related(qid, lang_code)
-        else:
+        query = self._sparql_query(info_type, qid, lang_code)
+        if query is None:
             return self._no_info_message(info_type, lang_code)
+        return self._format_results(info_type, self._run_sparql(query), lang_code)
 
-    async def _arun(self, name: str, info_type: str = "symptoms") -> str:
-        return self._run(name, info_type)
+    async def _arun(self, name: str, info_type: str = "symptoms", language: Optional[str] = None) -> str:
+        lang_code = LANG_MAP.get(language or st.session_state.lang, "en")
+        # Abbruch (CancelledError) wird weitergereicht, nur der Timeout wird abgefangen
+        try:
+            return await asyncio.wait_for(self._alookup(name, info_type, lang_code), timeout=self._timeout)
+        except asyncio.TimeoutError:
+            return self._no_info_message(info_type, lang_code)
 
-    def _find_qid(self, disease_name: str, lang_code: str) -> str:
-        """Findet die Wikidata Q-ID für eine Erkrankung anhand des Namens in der gewählten Sprache."""
-        params = {
+    async def _alookup(self, name: str, info_type: str, lang_code: str) -> str:
+        qid = await self._afind_qid(name, lang_code)
+        if not qid:
+            return self._no_info_message(info_type, lang_code)
+
+        query = self._sparql_query(info_type, qid, lang_code)
+        if query is None:
+            return self._no_info_message(info_type, lang_code)
+        return self._format_results(info_type, await self._arun_sparql(query), lang_code)
+
+    def _search_params(self, disease_name: str, lang_code: str) -> Dict[str, str]:
+        return {
             "action": "wbsearchentities",
             "search": disease_name,
             "language": lang_code,
             "type": "item",
             "format": "json"
         }
+
+    def _find_qid(self, disease_name: str, lang_code: str) -> str:
+        """Findet die Wikidata Q-ID für eine Erkrankung anhand des Namens in der gewählten Sprache."""
         try:
-            resp = requests.get(self._wikidata_url, params=params, timeout=5)
+            resp = self._http.get(self._wikidata_url, params=self._search_params(disease_name, lang_code))
             results = resp.json().get("search", [])
             if results:
                 return results[0]["id"]
@@ -67,36 +93,37 @@ class WikidataTool(BaseTool):
             pass
         return None
 
-    def _fetch_symptoms(self, qid: str, lang_code: str) -> str:
-        """Liest Symptome zu einer Q-ID aus Wikidata via SPARQL (mehrsprachig)."""
-        query = f"""
+    async def _afind_qid(self, disease_name: str, lang_code: str) -> str:
+        try:
+            resp = await get_async_http_client().get(
+                self._wikidata_url, params=self._search_params(disease_name, lang_code)
+            )
+            results = resp.json().get("search", [])
+            if results:
+                return results[0]["id"]
+        except (httpx.HTTPError, ValueError, KeyError):
+            pass
+        return None
+
+    def _sparql_query(self, info_type: str, qid: str, lang_code: str) -> Optional[str]:
+        if info_type == "symptoms":
+            # Symptome zu einer Q-ID (mehrsprachig)
+            return f"""
         SELECT ?symptomLabel WHERE {{
           wd:{qid} wdt:P780 ?symptom.
           SERVICE wikibase:label {{ bd:serviceParam wikibase:language "{lang_code},en". }}
         }}
         """
-        results = self._run_sparql(query)
-        if not results:
-            return self._no_info_message("symptoms", lang_code)
-        symptoms = [r["symptomLabel"]["value"] for r in results]
-        return self._format_multilang_response("symptoms", symptoms, lang_code)
-
-    def _fetch_icd(self, qid: str) -> str:
-        """Liest ICD-10-Codes aus Wikidata."""
-        query = f"""
+        if info_type == "icd":
+            # ICD-10-Codes
+            return f"""
         SELECT ?code WHERE {{
           wd:{qid} wdt:P494 ?code.
         }}
         """
-        results = self._run_sparql(query)
-        if not results:
-            return "No ICD-10 code found in Wikidata."
-        codes = [r["code"]["value"] for r in results]
-        return f"ICD-10-Code: {', '.join(codes)}"
-
-    def _fetch_related(self, qid: str, lang_code: str) -> str:
-        """Liest verwandte Krankheiten (mehrsprachig)."""
-        query = f"""
+        if info_type == "related":
+            # Verwandte Krankheiten (mehrsprachig)
+            return f"""
         SELECT ?relLabel WHERE {{
           {{ wd:{qid} wdt:P279 ?rel. }} UNION
           {{ wd:{qid} wdt:P1542 ?rel. }} UNION
@@ -104,21 +131,39 @@ class WikidataTool(BaseTool):
           SERVICE wikibase:label {{ bd:serviceParam wikibase:language "{lang_code},en". }}
         }}
         """
-        results = self._run_sparql(query)
+        return None
+
+    def _format_results(self, info_type: str, results: List[Dict[str, Any]], lang_code: str) -> str:
+        if info_type == "icd":
+            if not results:
+                return "No ICD-10 code found in Wikidata."
+            codes = [r["code"]["value"] for r in results]
+            return f"ICD-10-Code: {', '.join(codes)}"
+
         if not results:
-            return self._no_info_message("related", lang_code)
-        rels = [r["relLabel"]["value"] for r in results]
-        return self._format_multilang_response("related", rels, lang_code)
+            return self._no_info_message(info_type, lang_code)
+        label = "symptomLabel" if info_type == "symptoms" else "relLabel"
+        items = [r[label]["value"] for r in results]
+        return self._format_multilang_response(info_type, items, lang_code)
 
     def _run_sparql(self, query: str) -> List[Dict[str, Any]]:
         headers = {"Accept": "application/sparql-results+json"}
         try:
-            resp = requests.get(self._sparql_url, params={"query": query}, headers=headers, timeout=10)
+            resp = self._http.get(self._sparql_url, params={"query": query}, headers=headers)
             data = resp.json()
             return data.get("results", {}).get("bindings", [])
         except Exception:
             return []
 
+    async def _arun_sparql(self, query: str) -> List[Dict[str, Any]]:
+        headers = {"Accept": "application/sparql-results+json"}
+        try:
+            resp = await get_async_http_client().get(self._sparql_url, params={"query": query}, headers=headers)
+            data = resp.json()
+            return data.get("results", {}).get("bindings", [])
+        except (httpx.HTTPError, ValueError):
+            return []
+
     def _format_multilang_response(self, info_type: str, items: List[str], lang_code: str) -> str:
         info_titles = {
             "de": {"symptoms": "Symptome laut Wikidata", "related": "Verwandte Krankheiten laut Wikidata"},